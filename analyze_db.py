@@ -4,24 +4,47 @@ Database Performance Analysis Tool
 Command-line interface for comprehensive database analysis.
 """
 
-import argparse
 import sys
 import os
-import json
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from src.analysis.comprehensive_analysis import (
     analyze_postgres_query_with_unused_indexes,
     analyze_mysql_query_with_unused_indexes,
+    find_postgres_unused_indexes,
+    find_mysql_unused_indexes,
     format_comprehensive_report
 )
+from src.analysis.sql_features import extract_sql_features
+
+_DATABASES = ('postgres', 'mysql', 'both')
+
+_EPILOG = """
+Examples:
+  # Analyze PostgreSQL query
+  python analyze_db.py postgres "SELECT * FROM orders WHERE customer_id = 42;"
+  
+  # Analyze MySQL query
+  python analyze_db.py mysql "SELECT * FROM orders WHERE customer_id = 42;"
+  
+  # Analyze with custom plan file
+  python analyze_db.py postgres "SELECT * FROM orders WHERE customer_id = 42;" --plan-file artifacts/postgres/plans/pg_plan_1.json
+  
+  # Save results to file
+  python analyze_db.py both "SELECT * FROM orders WHERE customer_id = 42;" --output results.json --format json
+        """
+
+_SQL_KW_RE = re.compile(r'^\s*(?:SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
 
 def validate_query(query):
     """Validate SQL query input."""
     if not query or not query.strip():
         raise ValueError("Query cannot be empty")
     
-    # Basic SQL validation
-    query_upper = query.strip().upper()
-    if not any(query_upper.startswith(keyword) for keyword in ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH']):
+    # Basic SQL validation (anchored, so only the leading keyword is scanned)
+    if not _SQL_KW_RE.match(query):
         raise ValueError("Query must start with a valid SQL keyword (SELECT, INSERT, UPDATE, DELETE, WITH)")
     
     return query.strip()
@@ -32,30 +55,62 @@ def validate_plan_file(plan_file):
         raise FileNotFoundError(f"Plan file not found: {plan_file}")
     return plan_file
 
-def main():
-    """Main CLI function."""
+def _write_json_to_stdout(payload):
+    """Write orjson-encoded bytes straight to stdout, after any pending text output."""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(orjson.dumps(payload, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    sys.stdout.buffer.flush()
+
+def _extract_shared(query):
+    """Compute the engine-independent sub-results once for a multi-engine run."""
+    shared = {}
+    # The two unused-index scans are independent round trips, so overlap them with parsing
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fut_pg = executor.submit(find_postgres_unused_indexes)
+        fut_my = executor.submit(find_mysql_unused_indexes)
+        try:
+            shared['sql_features'] = extract_sql_features(query)
+        except ValueError:
+            # Let each analyzer report the parse failure through its own fallback
+            pass
+        shared['postgres_unused_indexes'] = fut_pg.result()
+        shared['mysql_unused_indexes'] = fut_my.result()
+    return shared
+
+def run(database, query, output_format='json', plan_file=None):
+    """Analyze a query in-process and return the rendered output as a string."""
+    validated_query = validate_query(query)
+    shared = _extract_shared(validated_query) if database == 'both' else None
+    
+    results = {}
+    if database in ['postgres', 'both']:
+        results['postgresql'] = analyze_postgres_query_with_unused_indexes(
+            validated_query,
+            validate_plan_file(plan_file),
+            _shared=shared
+        )
+    if database in ['mysql', 'both']:
+        results['mysql'] = analyze_mysql_query_with_unused_indexes(validated_query, _shared=shared)
+    
+    if output_format == 'json':
+        # A single engine is returned bare, matching what the CLI prints for it
+        payload = results if len(results) > 1 else next(iter(results.values()))
+        return orjson.dumps(payload, default=str, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return "\n\n".join(format_comprehensive_report(r) for r in results.values())
+
+def _build_parser():
+    """Build the full argument parser (needed for options, --help and error reporting)."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Comprehensive Database Performance Analysis Tool",
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  # Analyze PostgreSQL query
-  python analyze_db.py postgres "SELECT * FROM orders WHERE customer_id = 42;"
-  
-  # Analyze MySQL query
-  python analyze_db.py mysql "SELECT * FROM orders WHERE customer_id = 42;"
-  
-  # Analyze with custom plan file
-  python analyze_db.py postgres "SELECT * FROM orders WHERE customer_id = 42;" --plan-file artifacts/postgres/plans/pg_plan_1.json
-  
-  # Save results to file
-  python analyze_db.py both "SELECT * FROM orders WHERE customer_id = 42;" --output results.json --format json
-        """
+        epilog=_EPILOG
     )
     
     parser.add_argument(
         'database',
-        choices=['postgres', 'mysql', 'both'],
+        choices=_DATABASES,
         help='Database type to analyze'
     )
     
@@ -81,9 +136,20 @@ Examples:
         help='Output format (default: text)'
     )
     
+    return parser
+
+def _parse_args(argv):
+    """Parse CLI arguments, skipping argparse for the plain `<database> <query>` form."""
+    if len(argv) == 2 and argv[0] in _DATABASES and not argv[1].startswith('-'):
+        return SimpleNamespace(database=argv[0], query=argv[1], plan_file=None,
+                               output=None, format='text')
+    return _build_parser().parse_args(argv)
+
+def main():
+    """Main CLI function."""
     # Parse arguments with better error handling
     try:
-        args = parser.parse_args()
+        args = _parse_args(sys.argv[1:])
     except SystemExit:
         # argparse already printed the error message
         sys.exit(1)
@@ -98,12 +164,15 @@ Examples:
     
     try:
         results = {}
+        reports = {}
+        shared = _extract_shared(validated_query) if args.database == 'both' else None
         
         if args.database in ['postgres', 'both']:
             print("Analyzing PostgreSQL query...")
             postgres_results = analyze_postgres_query_with_unused_indexes(
                 validated_query, 
-                validated_plan_file
+                validated_plan_file,
+                _shared=shared
             )
             results['postgresql'] = postgres_results
             
@@ -111,31 +180,34 @@ Examples:
                 print("\n" + "="*80)
                 print("POSTGRESQL ANALYSIS RESULTS")
                 print("="*80)
-                print(format_comprehensive_report(postgres_results))
+                reports['postgresql'] = format_comprehensive_report(postgres_results)
+                print(reports['postgresql'])
             else:
-                print(json.dumps(postgres_results, indent=2))
+                _write_json_to_stdout(postgres_results)
         
         if args.database in ['mysql', 'both']:
             print("\nAnalyzing MySQL query...")
-            mysql_results = analyze_mysql_query_with_unused_indexes(validated_query)
+            mysql_results = analyze_mysql_query_with_unused_indexes(validated_query, _shared=shared)
             results['mysql'] = mysql_results
             
             if args.format == 'text':
                 print("\n" + "="*80)
                 print("MYSQL ANALYSIS RESULTS")
                 print("="*80)
-                print(format_comprehensive_report(mysql_results))
+                reports['mysql'] = format_comprehensive_report(mysql_results)
+                print(reports['mysql'])
             else:
-                print(json.dumps(mysql_results, indent=2))
+                _write_json_to_stdout(mysql_results)
         
         # Save results if output file specified
         if args.output:
             try:
-                with open(args.output, 'w', encoding='utf-8') as f:
+                with open(args.output, 'wb', buffering=1 << 20) as f:
                     if args.format == 'json':
-                        json.dump(results, f, indent=2)
+                        f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
                     else:
-                        f.write(format_comprehensive_report(results.get('postgresql', results.get('mysql', {}))))
+                        # Reuse the text already rendered for stdout instead of formatting again
+                        f.write(reports.get('postgresql', reports.get('mysql', '')).encode('utf-8'))
                 print(f"\nResults saved to: {args.output}")
             except IOError as e:
                 print(f"Error writing to output file: {e}", file=sys.stderr)
@@ -4,126 +4,278 @@ Database Performance Analysis Web Application
 Flask-based dashboard for database performance monitoring and alerting.
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, request
 import sys
 import os
 import json
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import wraps
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
+import orjson
+from cachetools import TTLCache
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.analysis.enhanced_analysis import EnhancedAnalysisPipeline
-from src.analysis.regression_analysis import PerformanceRegressionAnalyzer
-from src.analysis.configuration_analysis import ConfigurationAnalyzer
-from src.analysis.schema_analysis import SchemaAnalyzer
-from src.config.database_config import get_database_config
+from src.analysis.sql_features import normalize_whitespace
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-from hypopg_simulate import run_hypopg_simulation
+from hypopg_simulate import run_hypopg_simulation, clear_simulation_cache
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'db-performance-analysis-2024'
+# Templates only change on deploy; skip the per-render mtime checks
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
 
-# Initialize analysis components
-enhanced_pipeline = EnhancedAnalysisPipeline()
-regression_analyzer = PerformanceRegressionAnalyzer()
-config_analyzer = ConfigurationAnalyzer()
-schema_analyzer = SchemaAnalyzer()
+# Analysis components are imported and initialized on first use, once per worker
+_instances = {}
+_instances_lock = threading.Lock()
 
-@app.route('/')
+def _get_instance(name: str, factory):
+    """Return the singleton registered under `name`, creating it with `factory` on first use."""
+    instance = _instances.get(name)
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+def enhanced_pipeline():
+    """Shared EnhancedAnalysisPipeline instance."""
+    from src.analysis.enhanced_analysis import EnhancedAnalysisPipeline
+    return _get_instance('enhanced_pipeline', EnhancedAnalysisPipeline)
+
+def regression_analyzer():
+    """Shared PerformanceRegressionAnalyzer instance."""
+    from src.analysis.regression_analysis import PerformanceRegressionAnalyzer
+    return _get_instance('regression_analyzer', PerformanceRegressionAnalyzer)
+
+def config_analyzer():
+    """Shared ConfigurationAnalyzer instance."""
+    from src.analysis.configuration_analysis import ConfigurationAnalyzer
+    return _get_instance('config_analyzer', ConfigurationAnalyzer)
+
+def schema_analyzer():
+    """Shared SchemaAnalyzer instance."""
+    from src.analysis.schema_analysis import SchemaAnalyzer
+    return _get_instance('schema_analyzer', SchemaAnalyzer)
+
+# Severities surfaced as alerts
+_SEV_HIGH = frozenset(('CRITICAL', 'HIGH'))
+
+# PostgreSQL configuration analysis is skipped in alerts until this time after a failure
+_cfg_fail_until = [0.0]
+
+# Shared pool for overlapping independent analyzer calls within a request
+_EXEC = ThreadPoolExecutor(max_workers=8)
+
+def _json_default(obj):
+    """Serialize values orjson has no native support for (e.g. NUMERIC columns)."""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def ojsonify(payload, status: int = 200):
+    """Build a JSON response with orjson instead of the stdlib encoder."""
+    return app.response_class(
+        orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS),
+        status=status,
+        mimetype='application/json'
+    )
+
+# Second-granularity ISO timestamp shared by all responses
+_ts_cache = [0.0, ""]
+_ts_lock = threading.Lock()
+
+def iso_now() -> str:
+    """Return the current time as an ISO string, refreshed at most once per second."""
+    t = time.time()
+    with _ts_lock:
+        if t - _ts_cache[0] >= 1.0:
+            _ts_cache[0] = t
+            _ts_cache[1] = datetime.fromtimestamp(t).isoformat()
+        return _ts_cache[1]
+
+# In-process cache for analyzer-backed API responses
+_response_caches = []
+_cache_lock = threading.RLock()
+
+def _request_cache_key() -> str:
+    """Build a cache key from the request path, query string and JSON body."""
+    body = request.get_json(silent=True) or {}
+    if isinstance(body, dict) and isinstance(body.get('query'), str):
+        # Whitespace outside literals only: case and literal contents still tell queries apart
+        body = dict(body, query=normalize_whitespace(body['query']))
+    raw = json.dumps([request.path, sorted(request.args.items(multi=True)), body],
+                     sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+def cached_endpoint(ttl: int = 30, maxsize: int = 512):
+    """Cache successful responses of an API endpoint for `ttl` seconds."""
+    def decorator(view):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        _response_caches.append(cache)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _request_cache_key()
+            with _cache_lock:
+                hit = cache.get(key)
+            if hit is not None:
+                body, mimetype = hit
+                return app.response_class(body, mimetype=mimetype)
+
+            response = view(*args, **kwargs)
+            # Only successful responses are cached; errors always hit the analyzers again
+            if response.status_code == 200:
+                with _cache_lock:
+                    cache[key] = (response.get_data(), response.mimetype)
+            return response
+        return wrapper
+    return decorator
+
+# Regression scans shared by the hotspots, regressions and alerts endpoints
+_reg_cache = TTLCache(maxsize=64, ttl=15)
+
+def _cached_find_regressions(days: int, threshold: float) -> List[Dict[str, Any]]:
+    """Return find_all_regressions() results, reusing a scan from the last 15 seconds."""
+    key = (days, threshold)
+    with _cache_lock:
+        regressions = _reg_cache.get(key)
+    if regressions is None:
+        regressions = regression_analyzer().find_all_regressions(days=days, threshold=threshold)
+        with _cache_lock:
+            _reg_cache[key] = regressions
+    return regressions
+
+def invalidate_regression_cache():
+    """Forget cached regression scans so the next request rereads historical data."""
+    with _cache_lock:
+        _reg_cache.clear()
+
+# Query analyses keyed by the whitespace-normalized query; literals are part of the key
+# because selectivity-dependent findings change with them
+_analysis_cache = TTLCache(maxsize=256, ttl=300)
+
+def _analyze_query_cached(query: str, database: str) -> Dict[str, Any]:
+    """Run the enhanced query analysis, reusing a prior analysis of the same query."""
+    key = (database, normalize_whitespace(query))
+    with _cache_lock:
+        analysis = _analysis_cache.get(key)
+    if analysis is None:
+        analysis = enhanced_pipeline().analyze_query_with_regression(query, database)
+        with _cache_lock:
+            _analysis_cache[key] = analysis
+    
+    # Echo the caller's own query text; a cached entry may differ from it in whitespace
+    return dict(analysis, query=query,
+                basic_analysis=dict(analysis.get('basic_analysis') or {}, query=query))
+
+@app.get('/')
 def index():
     """Main dashboard page."""
     return render_template('index.html')
 
-@app.route('/dashboard')
+@app.get('/dashboard')
 def dashboard():
     """Performance dashboard."""
     return render_template('dashboard.html')
 
-@app.route('/alerts')
+@app.get('/alerts')
 def alerts():
     """Alerts and notifications page."""
     return render_template('alerts.html')
 
-@app.route('/configuration')
+@app.get('/configuration')
 def configuration():
     """Configuration analysis page."""
     return render_template('configuration.html')
 
-@app.route('/schema')
+@app.get('/schema')
 def schema():
     """Schema analysis page."""
     return render_template('schema.html')
 
 # API Endpoints
 
-@app.route('/api/hotspots')
+def _format_hotspot(reg: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a regression record for the hotspots table."""
+    recent = reg.get('recent_performance') or {}
+    return {
+        'query_id': reg.get('query_id'),
+        'query_text': (reg.get('query_text') or '')[:100] + '...',
+        'database_name': reg.get('database_name'),
+        'regression_percentage': reg.get('regression_percentage', 0),
+        'severity': reg.get('severity', 'UNKNOWN'),
+        'confidence': reg.get('confidence', 0),
+        'avg_exec_time_ms': recent.get('exec_time_ms', 0),
+        'calls': recent.get('calls', 0)
+    }
+
+@app.get('/api/hotspots')
+@cached_endpoint()
 def api_hotspots():
     """Get performance hotspots from historical data."""
     try:
         # Get slowest queries from historical data
-        regressions = regression_analyzer.find_all_regressions(days=7, threshold=0.3)
+        regressions = _cached_find_regressions(7, 0.3)
         
-        # Format for frontend
-        hotspots = []
-        for reg in regressions[:20]:  # Top 20
-            hotspots.append({
-                'query_id': reg.get('query_id'),
-                'query_text': reg.get('query_text', '')[:100] + '...',
-                'database_name': reg.get('database_name'),
-                'regression_percentage': reg.get('regression_percentage', 0),
-                'severity': reg.get('severity', 'UNKNOWN'),
-                'confidence': reg.get('confidence', 0),
-                'avg_exec_time_ms': reg.get('recent_performance', {}).get('exec_time_ms', 0),
-                'calls': reg.get('recent_performance', {}).get('calls', 0)
-            })
+        # Format for frontend (top 20)
+        hotspots = [_format_hotspot(reg) for reg in regressions[:20]]
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': hotspots,
             'count': len(hotspots),
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': []
-        }), 500
+        }, 500)
 
-@app.route('/api/performance-summary')
+@app.get('/api/performance-summary')
+@cached_endpoint()
 def api_performance_summary():
     """Get overall performance summary."""
     try:
-        summary = regression_analyzer.get_performance_summary(days=7)
+        summary = regression_analyzer().get_performance_summary(days=7)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': summary,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/regressions')
+@app.get('/api/regressions')
+@cached_endpoint()
 def api_regressions():
     """Get performance regressions."""
     try:
         days = request.args.get('days', 7, type=int)
         threshold = request.args.get('threshold', 0.5, type=float)
         
-        regressions = regression_analyzer.find_all_regressions(days=days, threshold=threshold)
+        regressions = _cached_find_regressions(days, threshold)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': regressions,
             'count': len(regressions),
@@ -131,90 +283,101 @@ def api_regressions():
                 'days': days,
                 'threshold': threshold
             },
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': []
-        }), 500
+        }, 500)
 
-@app.route('/api/configuration')
+@app.get('/api/configuration')
+@cached_endpoint(ttl=300)
 def api_configuration():
     """Get configuration analysis."""
     try:
         database = request.args.get('database', 'both')
         
         results = {}
-        if database in ['postgresql', 'both']:
-            results['postgresql'] = config_analyzer.analyze_postgresql_configuration()
+        if database == 'both':
+            f_pg = _EXEC.submit(config_analyzer().analyze_postgresql_configuration)
+            f_my = _EXEC.submit(config_analyzer().analyze_mysql_configuration)
+            results['postgresql'] = f_pg.result()
+            results['mysql'] = f_my.result()
+        elif database == 'postgresql':
+            results['postgresql'] = config_analyzer().analyze_postgresql_configuration()
+        elif database == 'mysql':
+            results['mysql'] = config_analyzer().analyze_mysql_configuration()
         
-        if database in ['mysql', 'both']:
-            results['mysql'] = config_analyzer.analyze_mysql_configuration()
-        
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': results,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/schema')
+@app.get('/api/schema')
+@cached_endpoint(ttl=300)
 def api_schema():
     """Get schema analysis."""
     try:
         database = request.args.get('database', 'both')
         
         results = {}
-        if database in ['postgresql', 'both']:
-            results['postgresql'] = schema_analyzer.analyze_postgresql_schema()
-        
-        if database in ['mysql', 'both']:
-            results['mysql'] = schema_analyzer.analyze_mysql_schema()
+        if database == 'both':
+            f_pg = _EXEC.submit(schema_analyzer().analyze_postgresql_schema)
+            f_my = _EXEC.submit(schema_analyzer().analyze_mysql_schema)
+            results['postgresql'] = f_pg.result()
+            results['mysql'] = f_my.result()
+        elif database == 'postgresql':
+            results['postgresql'] = schema_analyzer().analyze_postgresql_schema()
+        elif database == 'mysql':
+            results['mysql'] = schema_analyzer().analyze_mysql_schema()
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': results,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/health-check')
+@app.get('/api/health-check')
+@cached_endpoint()
 def api_health_check():
     """Perform comprehensive health check."""
     try:
         database = request.args.get('database', 'both')
         
-        health_analysis = enhanced_pipeline.analyze_database_health(database)
+        health_analysis = enhanced_pipeline().analyze_database_health(database)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': health_analysis,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/query-analysis', methods=['POST'])
+@app.post('/api/query-analysis')
 def api_query_analysis():
     """Analyze a specific query."""
     try:
@@ -223,27 +386,27 @@ def api_query_analysis():
         database = data.get('database', 'postgresql')
         
         if not query:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': 'Query is required'
-            }), 400
+            }, 400)
         
-        analysis = enhanced_pipeline.analyze_query_with_regression(query, database)
+        analysis = _analyze_query_cached(query, database)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': analysis,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/simulate', methods=['POST'])
+@app.post('/api/simulate')
 def api_simulate():
     """Simulate the effect of a database optimization recommendation."""
     try:
@@ -252,97 +415,156 @@ def api_simulate():
         recommendation = data.get('recommendation')
         
         if not query or not recommendation:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': 'Both query and recommendation are required'
-            }), 400
+            }, 400)
         
         # Run the simulation
         before_metrics, after_metrics = run_hypopg_simulation(query, recommendation)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'before': before_metrics,
             'after': after_metrics,
-            'generated_at': datetime.now().isoformat()
+            'generated_at': iso_now()
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'before': {},
             'after': {}
-        }), 500
+        }, 500)
 
-@app.route('/api/alerts')
+@app.get('/api/alerts')
 def api_alerts():
     """Get current alerts and notifications."""
     try:
+        # Regression and configuration checks are independent, so run them concurrently
+        f_reg = _EXEC.submit(_cached_find_regressions, 1, 0.5)
+        f_cfg = None
+        if time.time() >= _cfg_fail_until[0]:
+            f_cfg = _EXEC.submit(config_analyzer().analyze_postgresql_configuration)
+        
         # Get regressions as alerts
-        regressions = regression_analyzer.find_all_regressions(days=1, threshold=0.5)
+        regressions = f_reg.result()
+        ts = iso_now()
         
         alerts = []
         for reg in regressions:
-            if reg.get('severity') in ['CRITICAL', 'HIGH']:
+            if reg.get('severity') in _SEV_HIGH:
                 alerts.append({
                     'type': 'performance_regression',
                     'severity': reg.get('severity'),
                     'message': f"Query {reg.get('query_id')} has {reg.get('regression_percentage', 0):.1f}% performance regression",
                     'query_id': reg.get('query_id'),
                     'database': reg.get('database_name'),
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': ts
                 })
         
         # Get configuration issues as alerts
-        try:
-            config_issues = config_analyzer.analyze_postgresql_configuration()
-            if 'recommendations' in config_issues:
-                for rec in config_issues['recommendations']:
-                    if rec.get('severity') in ['CRITICAL', 'HIGH']:
-                        alerts.append({
-                            'type': 'configuration_issue',
-                            'severity': rec.get('severity'),
-                            'message': f"Configuration issue: {rec.get('issue')}",
-                            'setting': rec.get('setting'),
-                            'database': 'postgresql',
-                            'timestamp': datetime.now().isoformat()
-                        })
-        except:
-            pass  # Ignore config analysis errors
+        config_issues = {}
+        if f_cfg is not None:
+            try:
+                config_issues = f_cfg.result(timeout=10)
+                error = config_issues.get('error')
+            except Exception as e:
+                error = e
+            if error:
+                # Don't retry a failing (and possibly slow) analysis on every poll
+                _cfg_fail_until[0] = time.time() + 30
+                app.logger.warning("config analysis skipped: %s", error)
+        
+        for rec in config_issues.get('recommendations', []):
+            if rec.get('severity') in _SEV_HIGH:
+                alerts.append({
+                    'type': 'configuration_issue',
+                    'severity': rec.get('severity'),
+                    'message': f"Configuration issue: {rec.get('issue')}",
+                    'setting': rec.get('setting'),
+                    'database': 'postgresql',
+                    'timestamp': ts
+                })
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'data': alerts,
             'count': len(alerts),
-            'generated_at': datetime.now().isoformat()
+            'generated_at': ts
         })
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e),
             'data': []
-        }), 500
+        }, 500)
+
+@app.post('/api/cache/flush')
+def api_cache_flush():
+    """Drop all cached API responses and analyses held by this worker process."""
+    with _cache_lock:
+        flushed = sum(len(cache) for cache in _response_caches)
+        for cache in _response_caches:
+            cache.clear()
+        _analysis_cache.clear()
+    invalidate_regression_cache()
+    clear_simulation_cache()
+
+    return ojsonify({
+        'success': True,
+        'flushed': flushed,
+        'generated_at': iso_now()
+    })
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
-    return jsonify({
+    return ojsonify({
         'success': False,
         'error': 'Endpoint not found'
-    }), 404
+    }, 404)
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
-    return jsonify({
+    return ojsonify({
         'success': False,
         'error': 'Internal server error'
-    }), 500
+    }, 500)
+
+def run_server(host: str = '0.0.0.0', port: int = 5000, workers: int = 1, threads: int = 16):
+    """
+    Serve the app with gunicorn gthread workers, or the threaded dev server if gunicorn is unavailable.
+    
+    All caches live in the worker process and /api/cache/flush only reaches the worker
+    that receives it, so a single worker (threads overlap the blocking database calls)
+    is the default. With more workers, the others keep serving cached data until it expires.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # gunicorn is POSIX-only; keep the app usable on Windows and minimal installs
+        print("gunicorn not available, falling back to the threaded development server")
+        app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1', host=host, port=port, threaded=True)
+        return
+
+    class DashboardServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+
+        def load(self):
+            return app
+
+    DashboardServer().run()
 
 if __name__ == '__main__':
     print("Starting Database Performance Analysis Web Application...")
     print("Dashboard: http://localhost:5000/dashboard")
     print("API Documentation: http://localhost:5000/api/hotspots")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    run_server()
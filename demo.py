@@ -7,10 +7,17 @@ Demonstrates all capabilities of the analysis tool.
 import os
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Add project root to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+def iter_files(root):
+    """Yield (path, size) for every file under root, using the stat data cached by scandir."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            else:
+                yield entry.path, entry.stat(follow_symlinks=False).st_size
 
 def print_header(title):
     """Print a formatted header."""
@@ -86,21 +93,21 @@ def main():
     print_section("2. Testing Unused Index Detection")
     
     # Test unused index detection
-    import importlib.util
-    spec = importlib.util.spec_from_file_location("find_unused_indexes", "scripts/find_unused_indexes.py")
-    find_unused_indexes_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(find_unused_indexes_module)
-    find_postgres_unused_indexes = find_unused_indexes_module.find_postgres_unused_indexes
-    find_mysql_unused_indexes = find_unused_indexes_module.find_mysql_unused_indexes
+    from scripts.find_unused_indexes import find_postgres_unused_indexes, find_mysql_unused_indexes
+    
+    # Query both databases concurrently; the lookups are independent round trips
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fut_pg = executor.submit(find_postgres_unused_indexes)
+        fut_my = executor.submit(find_mysql_unused_indexes)
+        postgres_unused = fut_pg.result()
+        mysql_unused = fut_my.result()
     
     print("\n2.1 PostgreSQL Unused Indexes")
-    postgres_unused = find_postgres_unused_indexes()
     print(f"Found {len(postgres_unused)} unused indexes in PostgreSQL")
     for idx in postgres_unused:
         print(f"  - {idx['index_name']} on {idx['table_name']} (used {idx['times_used']} times, {idx['index_size']})")
     
     print("\n2.2 MySQL Unused Indexes")
-    mysql_unused = find_mysql_unused_indexes()
     print(f"Found {len(mysql_unused)} unused indexes in MySQL")
     for idx in mysql_unused:
         print(f"  - {idx['index_name']} on {idx['table_name']} (used {idx['times_used']} times)")
@@ -164,11 +171,9 @@ def main():
     artifacts_dir = "artifacts"
     if os.path.exists(artifacts_dir):
         print(f"\nGenerated artifacts in '{artifacts_dir}':")
-        for root, dirs, files in os.walk(artifacts_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                print(f"  - {file_path} ({file_size} bytes)")
+        rows = [f"  - {file_path} ({file_size} bytes)" for file_path, file_size in iter_files(artifacts_dir)]
+        if rows:
+            sys.stdout.write('\n'.join(rows) + '\n')
     else:
         print(f"\nNo artifacts directory found. Run analysis to generate artifacts.")
     
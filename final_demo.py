@@ -4,14 +4,24 @@ Final Demo - Complete Database Performance Analysis Tool
 Demonstrates all capabilities including validation harness.
 """
 
+import io
 import os
 import sys
 import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
 from datetime import datetime
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from demo import iter_files
+import analyze_db
+from src.analysis.comprehensive_analysis import main as comprehensive_main
+from scripts.find_unused_indexes import main as find_unused_main
+from scripts.validate_analysis_recommendations import main as validation_main
+
 def print_header(title):
     """Print a formatted header."""
     print("\n" + "="*80)
@@ -22,6 +32,100 @@ def print_section(title):
     """Print a formatted section header."""
     print(f"\n--- {title} ---")
 
+class _StageOutput(threading.local):
+    """Per-thread capture buffer for stages run in-process."""
+    buffer = None
+
+_stage_output = _StageOutput()
+
+class _CapturedBinary:
+    """Binary side of a capturing thread's stdout; bytes are decoded into its text buffer."""
+    
+    def write(self, data):
+        _stage_output.buffer.write(bytes(data).decode('utf-8', errors='replace'))
+        return len(data)
+    
+    def flush(self):
+        pass
+
+class _ThreadLocalStdout:
+    """stdout proxy that sends a capturing thread's writes to its own buffer."""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        buffer = _stage_output.buffer
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def flush(self):
+        if _stage_output.buffer is None:
+            self._stream.flush()
+    
+    @property
+    def buffer(self):
+        # Stages that write bytes (e.g. orjson output) must be captured too
+        return _CapturedBinary() if _stage_output.buffer is not None else self._stream.buffer
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+# The proxy is installed while any stage is running and removed after the last one
+_proxy_lock = threading.Lock()
+_active_stages = 0
+
+def run_stage(func, *args):
+    """Run a stage in-process and return (returncode, result, captured output)."""
+    global _active_stages
+    with _proxy_lock:
+        if _active_stages == 0:
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        _active_stages += 1
+    _stage_output.buffer = io.StringIO()
+    returncode, result = 0, None
+    try:
+        result = func(*args)
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception:
+        print(traceback.format_exc(), end='')
+        returncode = 1
+    finally:
+        output = _stage_output.buffer.getvalue()
+        _stage_output.buffer = None
+        with _proxy_lock:
+            _active_stages -= 1
+            if _active_stages == 0 and isinstance(sys.stdout, _ThreadLocalStdout):
+                sys.stdout = sys.stdout._stream
+    return returncode, result, output
+
+def run_cli_test(query, database, output_file):
+    """Run one analyze_db JSON analysis in-process, writing its output to output_file."""
+    output = analyze_db.run(database, query, 'json')
+    with open(output_file, 'w', encoding='utf-8') as out:
+        out.write(output)
+
+def run_job(name, func, *args):
+    """Run one demo job with its output captured and return (name, returncode, output)."""
+    returncode, _, output = run_stage(func, *args)
+    return name, returncode, output
+
+def run_waves(waves):
+    """Run each wave of (name, func, args) jobs concurrently, one wave after another."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(wave) for wave in waves)) as executor:
+        for wave in waves:
+            futures = [executor.submit(run_job, name, func, *args) for name, func, args in wave]
+            wait(futures, return_when=ALL_COMPLETED)
+            for future in futures:
+                name, returncode, output = future.result()
+                results[name] = (returncode, output)
+    return results
+
+def output_tail(output, lines=3):
+    """Return the last few non-empty lines of a job's output."""
+    return [line for line in output.splitlines() if line.strip()][-lines:]
+
 def main():
     """Run the complete final demo."""
     print_header("DATABASE PERFORMANCE ANALYSIS TOOL - FINAL DEMO")
@@ -31,37 +135,58 @@ def main():
     print_section("1. Running Comprehensive Analysis")
     print("Executing comprehensive analysis pipeline...")
     
-    # Run comprehensive analysis
-    os.system("python src/analysis/comprehensive_analysis.py")
+    # Test CLI with different options
+    test_queries = [
+        "SELECT * FROM orders WHERE customer_id = 42;",
+        "SELECT * FROM orders WHERE amount > 450 ORDER BY created_at DESC;"
+    ]
+    cli_jobs = [
+        (f"artifacts/cli_test_{i}_{database}.json", run_cli_test,
+         (query, database, f"artifacts/cli_test_{i}_{database}.json"))
+        for i, query in enumerate(test_queries, 1)
+        for database in ('postgres', 'mysql')
+    ]
+    
+    # Only validation reads another job's artifacts (the comprehensive analysis),
+    # so everything else runs alongside the analysis in the first wave
+    os.makedirs("artifacts", exist_ok=True)
+    results = run_waves([
+        [('comprehensive', comprehensive_main, ()), ('unused', find_unused_main, (['--report'],)), *cli_jobs],
+        [('validation', validation_main, ())],
+    ])
+    
+    comprehensive_rc, comprehensive_output = results['comprehensive']
+    print(comprehensive_output, end='')
+    if comprehensive_rc != 0:
+        print(f"⚠️  Exited with code {comprehensive_rc}")
     
     print_section("2. Running Validation Harness")
     print("Validating recommendations with performance testing...")
-    
-    # Run validation harness
-    os.system("python scripts/validate_analysis_recommendations.py")
+    validation_rc, validation_output = results['validation']
+    print(validation_output, end='')
+    if validation_rc != 0:
+        print(f"⚠️  Exited with code {validation_rc}")
     
     print_section("3. Running Unused Index Analysis")
     print("Detecting unused indexes across both databases...")
-    
-    # Run unused index analysis
-    os.system("python scripts/find_unused_indexes.py")
+    unused_rc, unused_output = results['unused']
+    print(unused_output, end='')
+    if unused_rc != 0:
+        print(f"⚠️  Exited with code {unused_rc}")
     
     print_section("4. Testing CLI Interface")
     print("Demonstrating command-line interface capabilities...")
     
-    # Test CLI with different options
-    test_queries = [
-        "SELECT * FROM orders WHERE customer_id = 42;",
-        "SELECT * FROM orders WHERE amount > 450 ORDER BY created_at DESC;"
-    ]
-    
     for i, query in enumerate(test_queries, 1):
-        print(f"\nTest Query {i}: {query}")
-        print("PostgreSQL Analysis:")
-        os.system(f'python analyze_db.py postgres "{query}" --format json > artifacts/cli_test_{i}_postgres.json')
-        
-        print("MySQL Analysis:")
-        os.system(f'python analyze_db.py mysql "{query}" --format json > artifacts/cli_test_{i}_mysql.json')
+        print(f"Test Query {i}: {query}")
+    
+    for output_file, _, _ in cli_jobs:
+        returncode, output = results[output_file]
+        status = "✅" if returncode == 0 else f"❌ (exit code {returncode})"
+        print(f"  {status} {output_file}")
+        if returncode != 0:
+            for line in output_tail(output):
+                print(f"      {line}")
     
     print_section("5. Generated Artifacts Summary")
     
@@ -70,12 +195,9 @@ def main():
     if os.path.exists(artifacts_dir):
         print(f"\nGenerated artifacts in '{artifacts_dir}':")
         total_size = 0
-        for root, dirs, files in os.walk(artifacts_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                total_size += file_size
-                print(f"  - {file_path} ({file_size:,} bytes)")
+        for file_path, file_size in iter_files(artifacts_dir):
+            total_size += file_size
+            print(f"  - {file_path} ({file_size:,} bytes)")
         
         print(f"\nTotal artifacts size: {total_size:,} bytes")
     else:
@@ -114,18 +236,25 @@ def main():
                 validation_results = json.load(f)
             
             print(f"\nValidation Results Summary:")
-            successful = sum(1 for r in validation_results if r.get('success', False))
-            excellent = sum(1 for r in validation_results if r.get('improvement', {}).get('overall_improvement') == 'EXCELLENT')
+            # Tally everything in one pass over the report
+            successful = excellent = 0
+            best_improvement = None
+            for r in validation_results:
+                improvement = r.get('improvement', {})
+                if improvement.get('overall_improvement') == 'EXCELLENT':
+                    excellent += 1
+                if r.get('success', False):
+                    successful += 1
+                    percent = improvement.get('execution_time_percent_improvement', 0)
+                    if best_improvement is None or percent > best_improvement:
+                        best_improvement = percent
             
             print(f"  Total Recommendations Validated: {len(validation_results)}")
             print(f"  Successful Validations: {successful}")
             print(f"  Excellent Performance Improvements: {excellent}")
             
             if validation_results:
-                best_improvement = max(
-                    (r.get('improvement', {}).get('execution_time_percent_improvement', 0) for r in validation_results if r.get('success')),
-                    default=0
-                )
+                best_improvement = best_improvement if best_improvement is not None else 0
                 print(f"  Best Performance Improvement: {best_improvement:.1f}%")
         except Exception as e:
             print(f"  Could not load validation results: {e}")
@@ -149,7 +278,7 @@ def main():
         "python scripts/validate_analysis_recommendations.py",
         "",
         "# Find unused indexes:",
-        "python scripts/find_unused_indexes.py",
+        "python scripts/find_unused_indexes.py --report",
         "",
         "# Run comprehensive analysis:",
         "python src/analysis/comprehensive_analysis.py"
@@ -36,6 +36,7 @@ CREATE TABLE IF NOT EXISTS slow_log_summary (
     summary_id SERIAL PRIMARY KEY,
     captured_at TIMESTAMPTZ DEFAULT NOW(),
     database_name VARCHAR(100) NOT NULL,
+    digest VARCHAR(64), -- performance_schema digest, to fetch the full sample on demand
     query_fingerprint TEXT,
     query_sample TEXT,
     total_time_s DOUBLE PRECISION,
@@ -48,6 +49,9 @@ CREATE TABLE IF NOT EXISTS slow_log_summary (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Added after the table was first released; brings existing databases up to date
+ALTER TABLE slow_log_summary ADD COLUMN IF NOT EXISTS digest VARCHAR(64);
+
 -- Table for index usage statistics
 CREATE TABLE IF NOT EXISTS index_usage_snapshots (
     snapshot_id SERIAL PRIMARY KEY,
@@ -75,6 +79,13 @@ CREATE TABLE IF NOT EXISTS query_plan_snapshots (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Last source watermark seen by each collector, used to skip idle collection runs
+CREATE TABLE IF NOT EXISTS collector_state (
+    collector_name VARCHAR(100) PRIMARY KEY, -- e.g. 'mysql:test'
+    watermark TEXT,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_query_snapshots_captured_at ON query_snapshots(captured_at);
 CREATE INDEX IF NOT EXISTS idx_query_snapshots_database ON query_snapshots(database_name);
@@ -109,6 +120,25 @@ FROM query_snapshots
 GROUP BY database_name, query_id, query_text, hour_bucket
 ORDER BY hour_bucket DESC, avg_exec_time_ms DESC;
 
+-- Materialized copy of the query trends, refreshed by the collector after each snapshot
+CREATE MATERIALIZED VIEW IF NOT EXISTS query_performance_trends_mv AS
+SELECT 
+    database_name,
+    query_id,
+    MAX(query_text) as query_text,
+    DATE_TRUNC('hour', captured_at) as hour_bucket,
+    COUNT(*) as snapshot_count,
+    AVG(total_exec_time_ms) as avg_exec_time_ms,
+    MAX(total_exec_time_ms) as max_exec_time_ms,
+    MIN(total_exec_time_ms) as min_exec_time_ms,
+    SUM(calls) as total_calls,
+    AVG(mean_exec_time_ms) as avg_mean_exec_time_ms
+FROM query_snapshots
+GROUP BY database_name, query_id, DATE_TRUNC('hour', captured_at);
+
+-- Unique index required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_query_performance_trends_mv_key ON query_performance_trends_mv(database_name, query_id, hour_bucket);
+
 -- Create a view for index usage trends
 CREATE OR REPLACE VIEW index_usage_trends AS
 SELECT 
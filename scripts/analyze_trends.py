@@ -5,18 +5,144 @@ Analyzes collected performance data to identify trends and patterns.
 """
 
 import psycopg2
+import psycopg2.pool
+from psycopg2 import sql
+from psycopg2.extras import NamedTupleCursor
 import sys
 import os
 import json
-import pandas as pd
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime
+from typing import List, Dict, Any
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config.database_config import get_database_config, get_historical_postgres_connection_string
 
+# Trend queries are PREPAREd once per connection and then run with EXECUTE,
+# so PostgreSQL parses and plans each of them only once per process.
+_TREND_STATEMENTS = {
+    'trend_query_performance': sql.SQL("""
+        SELECT 
+            database_name,
+            query_id,
+            query_text,
+            hour_bucket,
+            snapshot_count,
+            avg_exec_time_ms,
+            max_exec_time_ms,
+            min_exec_time_ms,
+            total_calls,
+            avg_mean_exec_time_ms
+        FROM query_performance_trends_mv
+        WHERE hour_bucket >= NOW() - make_interval(hours => $1::int)
+        ORDER BY hour_bucket DESC, avg_exec_time_ms DESC
+        LIMIT $2
+    """),
+    # The top decile only picks which queries to report; their averages and call
+    # counts still cover every snapshot of those queries in the window
+    'trend_slowest_queries': sql.SQL("""
+        WITH window_snapshots AS (
+            SELECT database_name, query_text, total_exec_time_ms, calls
+            FROM query_snapshots
+            WHERE captured_at >= NOW() - make_interval(hours => $1::int)
+        ), thresh AS (
+            SELECT percentile_cont(0.9) WITHIN GROUP (ORDER BY total_exec_time_ms) as p
+            FROM window_snapshots
+        ), slow AS (
+            SELECT DISTINCT database_name, query_text
+            FROM window_snapshots, thresh
+            WHERE total_exec_time_ms >= thresh.p
+        )
+        SELECT 
+            database_name,
+            query_text,
+            AVG(total_exec_time_ms) as avg_total_time,
+            MAX(total_exec_time_ms) as max_total_time,
+            SUM(calls) as total_calls,
+            COUNT(*) as snapshot_count
+        FROM window_snapshots
+        JOIN slow USING (database_name, query_text)
+        GROUP BY database_name, query_text
+        ORDER BY avg_total_time DESC
+        LIMIT $2
+    """),
+    'trend_index_usage': sql.SQL("""
+        SELECT 
+            database_name,
+            table_name,
+            index_name,
+            hour_bucket,
+            avg_times_used,
+            max_times_used,
+            min_times_used,
+            avg_index_size_kb
+        FROM index_usage_trends
+        WHERE hour_bucket >= NOW() - make_interval(hours => $1::int)
+        ORDER BY hour_bucket DESC, avg_times_used DESC
+    """),
+    'trend_unused_indexes': sql.SQL("""
+        SELECT 
+            database_name,
+            table_name,
+            index_name,
+            AVG(times_used) as avg_times_used,
+            MAX(times_used) as max_times_used,
+            AVG(index_size_kb) as avg_size_kb,
+            COUNT(*) as snapshot_count
+        FROM index_usage_snapshots
+        WHERE captured_at >= NOW() - make_interval(days => $1::int)
+        GROUP BY database_name, table_name, index_name
+        HAVING AVG(times_used) < 1
+        ORDER BY avg_size_kb DESC
+    """),
+    'trend_summary': sql.SQL("""
+        WITH q AS (
+            SELECT 
+                COUNT(DISTINCT query_id) as unique_queries,
+                SUM(calls) as total_calls,
+                AVG(total_exec_time_ms) as avg_exec_time,
+                MAX(total_exec_time_ms) as max_exec_time,
+                COUNT(*) as total_snapshots
+            FROM query_snapshots
+            WHERE captured_at >= NOW() - make_interval(hours => $1::int)
+        ), i AS (
+            SELECT 
+                COUNT(DISTINCT CONCAT(table_name, '.', index_name)) as unique_indexes,
+                AVG(times_used) as avg_usage,
+                COUNT(*) as total_index_snapshots
+            FROM index_usage_snapshots
+            WHERE captured_at >= NOW() - make_interval(hours => $1::int)
+        )
+        SELECT q.*, i.* FROM q, i
+    """),
+}
+
+# Columns of the fused summary row, split back into their two sections
+_QUERY_SUMMARY_COLUMNS = ('unique_queries', 'total_calls', 'avg_exec_time', 'max_exec_time', 'total_snapshots')
+_INDEX_SUMMARY_COLUMNS = ('unique_indexes', 'avg_usage', 'total_index_snapshots')
+
+@lru_cache(maxsize=8)
+def _build_historical_conn_str(historical_db_name: str) -> str:
+    """Build (once per database name) the historical connection string."""
+    return get_historical_postgres_connection_string(historical_db_name)
+
+def _to_dict(row) -> Dict[str, Any]:
+    """Convert a NamedTupleCursor row to a dict."""
+    return row._asdict()
+
+class _TrendConnection(psycopg2.extensions.connection):
+    """Connection that remembers which trend statements were prepared on it."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
 class PerformanceTrendAnalyzer:
     """Analyzes historical performance data for trends and patterns."""
     
@@ -26,143 +152,83 @@ class PerformanceTrendAnalyzer:
         self.db_config = get_database_config()
         
         # PostgreSQL connection for historical data (robust builder)
-        self.historical_conn_str = get_historical_postgres_connection_string(historical_db_name)
+        self.historical_conn_str = _build_historical_conn_str(historical_db_name)
+        
+        # Connection pool shared by all methods, created on first use
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    @contextmanager
+    def _conn(self):
+        """Borrow a pooled connection for the duration of the block."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        1, 5, self.historical_conn_str, connection_factory=_TrendConnection
+                    )
+        conn = self._pool.getconn()
+        conn.autocommit = True
+        try:
+            yield conn
+        finally:
+            self._pool.putconn(conn, close=bool(conn.closed))
     
-    def get_query_performance_trends(self, hours: int = 24, limit: int = 20) -> List[Dict[str, Any]]:
+    def close(self):
+        """Close every pooled connection."""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+    
+    def _execute(self, cur, name: str, params: tuple):
+        """Run a trend statement, preparing it on the connection the first time."""
+        prepared = cur.connection.prepared
+        statement = sql.Identifier(name)
+        if name not in prepared:
+            cur.execute(sql.SQL("PREPARE {} AS ").format(statement) + _TREND_STATEMENTS[name])
+            prepared.add(name)
+        placeholders = sql.SQL(", ").join(sql.Placeholder() * len(params))
+        cur.execute(sql.SQL("EXECUTE {} ({})").format(statement, placeholders), params)
+    
+    def get_query_performance_trends(self, hours: int = 24, limit: int = 20) -> List[tuple]:
         """Get query performance trends over time."""
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    query = """
-                    SELECT 
-                        database_name,
-                        query_id,
-                        query_text,
-                        hour_bucket,
-                        snapshot_count,
-                        avg_exec_time_ms,
-                        max_exec_time_ms,
-                        min_exec_time_ms,
-                        total_calls,
-                        avg_mean_exec_time_ms
-                    FROM query_performance_trends
-                    WHERE hour_bucket >= NOW() - INTERVAL '%s hours'
-                    ORDER BY hour_bucket DESC, avg_exec_time_ms DESC
-                    LIMIT %s
-                    """
-                    
-                    cur.execute(query, (hours, limit))
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        results.append(result)
-                    
-                    return results
+            with self._conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                self._execute(cur, 'trend_query_performance', (hours, limit))
+                return cur.fetchall()
                     
         except Exception as e:
             print(f"Error getting query performance trends: {e}")
             return []
     
-    def get_slowest_queries(self, hours: int = 24, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_slowest_queries(self, hours: int = 24, limit: int = 10) -> List[tuple]:
         """Get the slowest queries over time."""
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    query = """
-                    SELECT 
-                        database_name,
-                        query_text,
-                        AVG(total_exec_time_ms) as avg_total_time,
-                        MAX(total_exec_time_ms) as max_total_time,
-                        SUM(calls) as total_calls,
-                        COUNT(*) as snapshot_count
-                    FROM query_snapshots
-                    WHERE captured_at >= NOW() - INTERVAL '%s hours'
-                    GROUP BY database_name, query_text
-                    ORDER BY avg_total_time DESC
-                    LIMIT %s
-                    """
-                    
-                    cur.execute(query, (hours, limit))
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        results.append(result)
-                    
-                    return results
+            with self._conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                self._execute(cur, 'trend_slowest_queries', (hours, limit))
+                return cur.fetchall()
                     
         except Exception as e:
             print(f"Error getting slowest queries: {e}")
             return []
     
-    def get_index_usage_trends(self, hours: int = 24) -> List[Dict[str, Any]]:
+    def get_index_usage_trends(self, hours: int = 24) -> List[tuple]:
         """Get index usage trends over time."""
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    query = """
-                    SELECT 
-                        database_name,
-                        table_name,
-                        index_name,
-                        hour_bucket,
-                        avg_times_used,
-                        max_times_used,
-                        min_times_used,
-                        avg_index_size_kb
-                    FROM index_usage_trends
-                    WHERE hour_bucket >= NOW() - INTERVAL '%s hours'
-                    ORDER BY hour_bucket DESC, avg_times_used DESC
-                    """
-                    
-                    cur.execute(query, (hours,))
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        results.append(result)
-                    
-                    return results
+            with self._conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                self._execute(cur, 'trend_index_usage', (hours,))
+                return cur.fetchall()
                     
         except Exception as e:
             print(f"Error getting index usage trends: {e}")
             return []
     
-    def get_unused_indexes(self, days: int = 7) -> List[Dict[str, Any]]:
+    def get_unused_indexes(self, days: int = 7) -> List[tuple]:
         """Get indexes that haven't been used recently."""
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    query = """
-                    SELECT 
-                        database_name,
-                        table_name,
-                        index_name,
-                        AVG(times_used) as avg_times_used,
-                        MAX(times_used) as max_times_used,
-                        AVG(index_size_kb) as avg_size_kb,
-                        COUNT(*) as snapshot_count
-                    FROM index_usage_snapshots
-                    WHERE captured_at >= NOW() - INTERVAL '%s days'
-                    GROUP BY database_name, table_name, index_name
-                    HAVING AVG(times_used) < 1
-                    ORDER BY avg_size_kb DESC
-                    """
-                    
-                    cur.execute(query, (days,))
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        results.append(result)
-                    
-                    return results
+            with self._conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                self._execute(cur, 'trend_unused_indexes', (days,))
+                return cur.fetchall()
                     
         except Exception as e:
             print(f"Error getting unused indexes: {e}")
@@ -171,113 +237,102 @@ class PerformanceTrendAnalyzer:
     def get_performance_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get overall performance summary."""
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    # Get query performance summary
-                    query_summary = """
-                    SELECT 
-                        COUNT(DISTINCT query_id) as unique_queries,
-                        SUM(calls) as total_calls,
-                        AVG(total_exec_time_ms) as avg_exec_time,
-                        MAX(total_exec_time_ms) as max_exec_time,
-                        COUNT(*) as total_snapshots
-                    FROM query_snapshots
-                    WHERE captured_at >= NOW() - INTERVAL '%s hours'
-                    """
-                    
-                    cur.execute(query_summary, (hours,))
-                    query_stats = dict(zip([desc[0] for desc in cur.description], cur.fetchone()))
-                    
-                    # Get index usage summary
-                    index_summary = """
-                    SELECT 
-                        COUNT(DISTINCT CONCAT(table_name, '.', index_name)) as unique_indexes,
-                        AVG(times_used) as avg_usage,
-                        COUNT(*) as total_index_snapshots
-                    FROM index_usage_snapshots
-                    WHERE captured_at >= NOW() - INTERVAL '%s hours'
-                    """
-                    
-                    cur.execute(index_summary, (hours,))
-                    index_stats = dict(zip([desc[0] for desc in cur.description], cur.fetchone()))
-                    
-                    return {
-                        'query_performance': query_stats,
-                        'index_usage': index_stats,
-                        'analysis_period_hours': hours,
-                        'generated_at': datetime.now().isoformat()
-                    }
+            with self._conn() as conn, conn.cursor(cursor_factory=NamedTupleCursor) as cur:
+                # Both aggregates come back in one row from a single round trip
+                self._execute(cur, 'trend_summary', (hours,))
+                row = cur.fetchone()
+                row = row._asdict()
+                query_stats = {col: row[col] for col in _QUERY_SUMMARY_COLUMNS}
+                index_stats = {col: row[col] for col in _INDEX_SUMMARY_COLUMNS}
+                
+                return {
+                    'query_performance': query_stats,
+                    'index_usage': index_stats,
+                    'analysis_period_hours': hours,
+                    'generated_at': datetime.now().isoformat()
+                }
                     
         except Exception as e:
             print(f"Error getting performance summary: {e}")
             return {}
     
-    def generate_trend_report(self, hours: int = 24) -> str:
-        """Generate a comprehensive trend report."""
-        report = []
-        report.append("=" * 80)
-        report.append("📊 DATABASE PERFORMANCE TREND ANALYSIS")
-        report.append("=" * 80)
-        report.append(f"Analysis Period: Last {hours} hours")
-        report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("")
+    def _trend_report_lines(self, hours: int):
+        """Yield the lines of the trend report, one formatted block per row."""
+        yield "=" * 80
+        yield "📊 DATABASE PERFORMANCE TREND ANALYSIS"
+        yield "=" * 80
+        yield f"Analysis Period: Last {hours} hours"
+        yield f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        yield ""
         
         # Performance summary
         summary = self.get_performance_summary(hours)
         if summary:
-            report.append("📈 PERFORMANCE SUMMARY")
-            report.append("-" * 40)
             query_perf = summary.get('query_performance', {})
-            report.append(f"Unique Queries: {query_perf.get('unique_queries', 0)}")
-            report.append(f"Total Calls: {query_perf.get('total_calls', 0):,}")
-            report.append(f"Average Execution Time: {query_perf.get('avg_exec_time', 0):.2f} ms")
-            report.append(f"Maximum Execution Time: {query_perf.get('max_exec_time', 0):.2f} ms")
-            report.append("")
-            
             index_usage = summary.get('index_usage', {})
-            report.append(f"Unique Indexes: {index_usage.get('unique_indexes', 0)}")
-            report.append(f"Average Index Usage: {index_usage.get('avg_usage', 0):.2f}")
-            report.append("")
+            yield (
+                "📈 PERFORMANCE SUMMARY\n"
+                f"{'-' * 40}\n"
+                f"Unique Queries: {query_perf.get('unique_queries', 0)}\n"
+                f"Total Calls: {query_perf.get('total_calls', 0):,}\n"
+                f"Average Execution Time: {query_perf.get('avg_exec_time', 0):.2f} ms\n"
+                f"Maximum Execution Time: {query_perf.get('max_exec_time', 0):.2f} ms\n"
+                "\n"
+                f"Unique Indexes: {index_usage.get('unique_indexes', 0)}\n"
+                f"Average Index Usage: {index_usage.get('avg_usage', 0):.2f}\n"
+            )
         
         # Slowest queries
         slowest_queries = self.get_slowest_queries(hours, 5)
         if slowest_queries:
-            report.append("🐌 SLOWEST QUERIES")
-            report.append("-" * 40)
+            yield "🐌 SLOWEST QUERIES"
+            yield "-" * 40
             for i, query in enumerate(slowest_queries, 1):
-                report.append(f"{i}. {query['database_name']} - {query['avg_total_time']:.2f} ms avg")
-                report.append(f"   Calls: {query['total_calls']:,}")
-                report.append(f"   Query: {query['query_text'][:100]}...")
-                report.append("")
+                yield (
+                    f"{i}. {query.database_name} - {query.avg_total_time:.2f} ms avg\n"
+                    f"   Calls: {query.total_calls:,}\n"
+                    f"   Query: {query.query_text[:100]}...\n"
+                )
         
         # Unused indexes
         unused_indexes = self.get_unused_indexes(7)
         if unused_indexes:
-            report.append("🗑️  POTENTIALLY UNUSED INDEXES")
-            report.append("-" * 40)
+            yield "🗑️  POTENTIALLY UNUSED INDEXES"
+            yield "-" * 40
             for i, index in enumerate(unused_indexes[:5], 1):
-                report.append(f"{i}. {index['database_name']}.{index['table_name']}.{index['index_name']}")
-                report.append(f"   Usage: {index['avg_times_used']:.2f} times")
-                report.append(f"   Size: {index['avg_size_kb']:.2f} KB")
-                report.append("")
-        
-        return "\n".join(report)
+                yield (
+                    f"{i}. {index.database_name}.{index.table_name}.{index.index_name}\n"
+                    f"   Usage: {index.avg_times_used:.2f} times\n"
+                    f"   Size: {index.avg_size_kb:.2f} KB\n"
+                )
+    
+    def generate_trend_report(self, hours: int = 24) -> str:
+        """Generate a comprehensive trend report."""
+        return "\n".join(self._trend_report_lines(hours))
     
     def export_trends_to_json(self, hours: int = 24, output_file: str = None) -> str:
         """Export trend data to JSON file."""
         if not output_file:
             output_file = f"trends_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        data = {
-            'summary': self.get_performance_summary(hours),
-            'slowest_queries': self.get_slowest_queries(hours, 20),
-            'unused_indexes': self.get_unused_indexes(7),
-            'query_trends': self.get_query_performance_trends(hours, 50),
-            'index_trends': self.get_index_usage_trends(hours)
-        }
+        # The five reports share no data, so run them on separate pooled connections
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = {
+                'summary': executor.submit(self.get_performance_summary, hours),
+                'slowest_queries': executor.submit(self.get_slowest_queries, hours, 20),
+                'unused_indexes': executor.submit(self.get_unused_indexes, 7),
+                'query_trends': executor.submit(self.get_query_performance_trends, hours, 50),
+                'index_trends': executor.submit(self.get_index_usage_trends, hours)
+            }
+            data = {key: future.result() for key, future in futures.items()}
+        
+        # Rows come back as named tuples; the JSON export needs objects
+        for key in ('slowest_queries', 'unused_indexes', 'query_trends', 'index_trends'):
+            data[key] = [_to_dict(row) for row in data[key]]
         
-        with open(output_file, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        # orjson encodes datetimes in C; default=str only covers Decimal aggregates
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC))
         
         return output_file
 
@@ -315,6 +370,8 @@ def main():
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
         sys.exit(1)
+    finally:
+        analyzer.close()
 
 if __name__ == '__main__':
     main()
@@ -8,46 +8,41 @@ import sys
 import os
 import subprocess
 import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def run_collector(script_name: str, args: list = None) -> bool:
+def run_collector(script_name: str, args: list = None, prefix: str = "") -> bool:
     """Run a collection script and return success status."""
     if args is None:
         args = []
+    # Tag each line so concurrent collectors stay readable
+    tag = f"[{prefix}] " if prefix else ""
     
     script_path = os.path.join(os.path.dirname(__file__), script_name)
-    cmd = [sys.executable, script_path] + args
+    # -u: a child writing to a pipe would otherwise block-buffer and only flush on exit
+    cmd = [sys.executable, '-u', script_path] + args
     
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(f"✅ {script_name} completed successfully")
-        if result.stdout:
-            print(f"   Output: {result.stdout.strip()}")
+        # Stream the child's output as it runs instead of buffering it all
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        for line in proc.stdout:
+            print(f"   {tag}{line}", end="")
+        returncode = proc.wait()
+        if returncode != 0:
+            print(f"❌ {tag}{script_name} failed with exit code {returncode}")
+            return False
+        print(f"✅ {tag}{script_name} completed successfully")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {script_name} failed with exit code {e.returncode}")
-        if e.stderr:
-            print(f"   Error: {e.stderr.strip()}")
-        return False
     except Exception as e:
-        print(f"❌ {script_name} failed with exception: {e}")
+        print(f"❌ {tag}{script_name} failed with exception: {e}")
         return False
 
-def main():
-    """Main function for collecting all statistics."""
-    parser = argparse.ArgumentParser(description="Collect all database performance statistics")
-    parser.add_argument('--postgres-db', default='postgres', help='PostgreSQL database name')
-    parser.add_argument('--mysql-db', default='test', help='MySQL database name')
-    parser.add_argument('--historical-db', default='performance_history', help='Historical database name')
-    parser.add_argument('--skip-postgres', action='store_true', help='Skip PostgreSQL collection')
-    parser.add_argument('--skip-mysql', action='store_true', help='Skip MySQL collection')
-    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
-    
-    args = parser.parse_args()
-    
+def collect_once(args) -> bool:
+    """Run one round of collection and print its summary; returns overall success."""
     print("🚀 Starting Database Performance Statistics Collection")
     print("=" * 60)
     print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -55,40 +50,44 @@ def main():
     print("")
     
     results = {}
+    jobs = {}
     
-    # Collect PostgreSQL statistics
-    if not args.skip_postgres:
-        print("📊 Collecting PostgreSQL Statistics")
-        print("-" * 40)
-        postgres_args = [
-            '--target-db', args.postgres_db,
-            '--historical-db', args.historical_db
-        ]
-        if args.verbose:
-            postgres_args.append('--verbose')
+    # The two collectors target different engines, so run them side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Collect PostgreSQL statistics
+        if not args.skip_postgres:
+            print("📊 Collecting PostgreSQL Statistics")
+            postgres_args = [
+                '--target-db', args.postgres_db,
+                '--historical-db', args.historical_db
+            ]
+            if args.verbose:
+                postgres_args.append('--verbose')
+            
+            jobs['postgres'] = executor.submit(run_collector, 'collect_postgres_stats.py', postgres_args, 'postgres')
+        else:
+            print("⏭️  Skipping PostgreSQL collection")
+            results['postgres'] = True
         
-        results['postgres'] = run_collector('collect_postgres_stats.py', postgres_args)
-        print("")
-    else:
-        print("⏭️  Skipping PostgreSQL collection")
-        results['postgres'] = True
-    
-    # Collect MySQL statistics
-    if not args.skip_mysql:
-        print("📊 Collecting MySQL Statistics")
-        print("-" * 40)
-        mysql_args = [
-            '--target-db', args.mysql_db,
-            '--historical-db', args.historical_db
-        ]
-        if args.verbose:
-            mysql_args.append('--verbose')
+        # Collect MySQL statistics
+        if not args.skip_mysql:
+            print("📊 Collecting MySQL Statistics")
+            mysql_args = [
+                '--target-db', args.mysql_db,
+                '--historical-db', args.historical_db
+            ]
+            if args.verbose:
+                mysql_args.append('--verbose')
+            
+            jobs['mysql'] = executor.submit(run_collector, 'collect_mysql_stats.py', mysql_args, 'mysql')
+        else:
+            print("⏭️  Skipping MySQL collection")
+            results['mysql'] = True
         
-        results['mysql'] = run_collector('collect_mysql_stats.py', mysql_args)
-        print("")
-    else:
-        print("⏭️  Skipping MySQL collection")
-        results['mysql'] = True
+        print("-" * 40)
+        for name, future in jobs.items():
+            results[name] = future.result()
+    print("")
     
     # Summary
     print("📋 Collection Summary")
@@ -103,10 +102,62 @@ def main():
     if overall_success:
         print("\n🎉 All statistics collection completed successfully!")
         print("💡 Run 'python scripts/analyze_trends.py --report' to view trends")
-        sys.exit(0)
     else:
         print("\n⚠️  Some collections failed - check the output above")
-        sys.exit(1)
+    return overall_success
+
+def collect_forever(args, interval_minutes: int):
+    """
+    Collect every interval_minutes until interrupted.
+    
+    Deadlines are laid out from the first run (start + k * interval) rather than
+    counted from the end of the previous run, so slow collections do not make the
+    schedule drift. Ticks missed by a run that overran are skipped, not made up.
+    Cron and systemd timers already fire on wall-clock boundaries and do not need this.
+    """
+    interval = interval_minutes * 60
+    next_fire = time.monotonic()
+    while True:
+        collect_once(args)
+        next_fire += interval
+        now = time.monotonic()
+        if next_fire < now:
+            next_fire += (int((now - next_fire) // interval) + 1) * interval
+        print(f"\n⏰ Next collection in {next_fire - now:.0f}s")
+        time.sleep(max(0, next_fire - time.monotonic()))
+
+def positive_int(value: str) -> int:
+    """argparse type for a whole number greater than zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {number}")
+    return number
+
+def main():
+    """Main function for collecting all statistics."""
+    parser = argparse.ArgumentParser(description="Collect all database performance statistics")
+    parser.add_argument('--postgres-db', default='postgres', help='PostgreSQL database name')
+    parser.add_argument('--mysql-db', default='test', help='MySQL database name')
+    parser.add_argument('--historical-db', default='performance_history', help='Historical database name')
+    parser.add_argument('--skip-postgres', action='store_true', help='Skip PostgreSQL collection')
+    parser.add_argument('--skip-mysql', action='store_true', help='Skip MySQL collection')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
+    parser.add_argument('--interval', type=positive_int, metavar='MINUTES',
+                        help='Keep running and collect every MINUTES minutes (daemon mode)')
+    
+    args = parser.parse_args()
+    
+    if args.interval is not None:
+        try:
+            collect_forever(args, args.interval)
+        except KeyboardInterrupt:
+            print("\n🛑 Collection stopped")
+            sys.exit(0)
+    
+    sys.exit(0 if collect_once(args) else 1)
 
 if __name__ == '__main__':
     main()
@@ -5,20 +5,124 @@ Collects slow query log data and stores it in historical database.
 """
 
 import mysql.connector
+import mysql.connector.pooling
 import psycopg2
+import psycopg2.pool
 import sys
 import os
 import json
 import subprocess
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.storage.bulk_copy import copy_rows
 from src.config.database_config import get_database_config, get_historical_postgres_connection_string
 
+# Resolved once at import and shared by every collector instance; the DSN-style
+# connection_string is for display only and mysql.connector rejects it as an argument
+_DB_CONFIG = get_database_config()
+_BASE_MYSQL_CONFIG = {k: v for k, v in _DB_CONFIG.get_mysql_config().items() if k != 'connection_string'}
+
+# Characters of each digest's sample statement kept in slow_log_summary;
+# the full text can be fetched on demand with fetch_query_sample()
+QUERY_SAMPLE_PREVIEW_CHARS = 512
+
+# SQL is built once at import and reused by every collection.
+# Slow queries from performance_schema; the top 100 digests are picked first
+# so the picosecond-to-second conversion only runs on those rows
+_SLOW_QUERY_SQL = """
+    SELECT 
+        %s as database_name,
+        DIGEST as digest,
+        DIGEST_TEXT as query_fingerprint,
+        LEFT(QUERY_SAMPLE_TEXT, %s) as query_sample,
+        COUNT_STAR as calls,
+        TRUNCATE(SUM_TIMER_WAIT * 1e-12, 6) as total_time_s,
+        TRUNCATE(AVG_TIMER_WAIT * 1e-12, 6) as avg_time_s,
+        TRUNCATE(MIN_TIMER_WAIT * 1e-12, 6) as min_time_s,
+        TRUNCATE(MAX_TIMER_WAIT * 1e-12, 6) as max_time_s,
+        SUM_ROWS_EXAMINED as rows_examined,
+        SUM_ROWS_SENT as rows_sent
+    FROM (
+        SELECT DIGEST, DIGEST_TEXT, QUERY_SAMPLE_TEXT, COUNT_STAR,
+               SUM_TIMER_WAIT, AVG_TIMER_WAIT, MIN_TIMER_WAIT, MAX_TIMER_WAIT,
+               SUM_ROWS_EXAMINED, SUM_ROWS_SENT
+        FROM performance_schema.events_statements_summary_by_digest
+        WHERE COUNT_STAR > 0
+        ORDER BY SUM_TIMER_WAIT DESC
+        LIMIT 100
+    ) top_digests
+    ORDER BY SUM_TIMER_WAIT DESC
+"""
+
+# Newest digest activity; unchanged since the last run means there is nothing new to collect.
+# The collector's own performance_schema/sys reads and session SETs are left out, since
+# they would otherwise move the watermark on every run
+_LAST_SEEN_SQL = """
+    SELECT MAX(LAST_SEEN)
+    FROM performance_schema.events_statements_summary_by_digest
+    WHERE DIGEST_TEXT NOT LIKE '%performance_schema%'
+    AND DIGEST_TEXT NOT LIKE '%`sys`%'
+    AND DIGEST_TEXT NOT LIKE 'SET %'
+"""
+
+_QUERY_SAMPLE_SQL = "SELECT QUERY_SAMPLE_TEXT FROM performance_schema.events_statements_summary_by_digest WHERE DIGEST = %s"
+
+# Unused indexes from sys.schema_unused_indexes
+_UNUSED_INDEXES_SQL = """
+    SELECT 
+        %s as database_name,
+        'mysql' as database_type,
+        object_schema as schema_name,
+        object_name as table_name,
+        index_name,
+        0 as times_used,
+        'Unknown' as size_pretty,
+        0 as size_kb
+    FROM sys.schema_unused_indexes
+    WHERE object_schema = %s
+"""
+
+# Used indexes from performance_schema
+_USED_INDEXES_SQL = """
+    SELECT 
+        %s as database_name,
+        'mysql' as database_type,
+        OBJECT_SCHEMA as schema_name,
+        OBJECT_NAME as table_name,
+        INDEX_NAME as index_name,
+        COUNT_FETCH + COUNT_INSERT + COUNT_UPDATE + COUNT_DELETE as times_used,
+        'Unknown' as size_pretty,
+        0 as size_kb
+    FROM performance_schema.table_io_waits_summary_by_index_usage
+    WHERE OBJECT_SCHEMA = %s
+    AND (COUNT_FETCH + COUNT_INSERT + COUNT_UPDATE + COUNT_DELETE) > 0
+"""
+
+_LOAD_WATERMARK_SQL = "SELECT watermark FROM collector_state WHERE collector_name = %s"
+_SAVE_WATERMARK_SQL = """
+    INSERT INTO collector_state (collector_name, watermark, updated_at)
+    VALUES (%s, %s, NOW())
+    ON CONFLICT (collector_name) DO UPDATE
+    SET watermark = EXCLUDED.watermark, updated_at = EXCLUDED.updated_at
+"""
+
+_SLOW_LOG_COLUMNS = (
+    'database_name', 'digest', 'query_fingerprint', 'query_sample', 'total_time_s',
+    'calls', 'avg_time_s', 'min_time_s', 'max_time_s', 'rows_examined', 'rows_sent'
+)
+_INDEX_USAGE_COLUMNS = ('database_name', 'database_type', 'table_name', 'index_name',
+                        'times_used', 'index_size_kb')
+_INDEX_USAGE_KEYS = ('database_name', 'database_type', 'table_name', 'index_name',
+                     'times_used', 'size_kb')
+
 class MySQLStatsCollector:
     """Collects MySQL performance statistics."""
     
@@ -26,97 +130,129 @@ class MySQLStatsCollector:
         """Initialize the collector."""
         self.target_db_name = target_db_name
         self.historical_db_name = historical_db_name
-        self.db_config = get_database_config()
+        self.db_config = _DB_CONFIG
         
         # MySQL connection config
-        self.mysql_config = self.db_config.get_mysql_config()
-        self.mysql_config['database'] = target_db_name
+        self.mysql_config = {**_BASE_MYSQL_CONFIG, 'database': target_db_name}
         
         # PostgreSQL connection for historical storage
         self.historical_conn_str = get_historical_postgres_connection_string(historical_db_name)
+        self.state_key = f"mysql:{target_db_name}"
+        
+        # Connection pools, created on first use and shared by all collect/store calls
+        self._mysql_pool = None
+        self._historical_pool = None
+        self._pools_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the historical pool; pooled MySQL connections close with the process."""
+        with self._pools_lock:
+            if self._historical_pool is not None:
+                self._historical_pool.closeall()
+                self._historical_pool = None
+            self._mysql_pool = None
+    
+    @contextmanager
+    def _mysql_conn(self):
+        """Borrow a pooled MySQL connection for the duration of the block."""
+        if self._mysql_pool is None:
+            with self._pools_lock:
+                if self._mysql_pool is None:
+                    self._mysql_pool = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name=f"collector_{id(self)}", pool_size=2, **self.mysql_config
+                    )
+        conn = self._mysql_pool.get_connection()
+        try:
+            yield conn
+        finally:
+            # Returns the connection to the pool
+            conn.close()
+    
+    @contextmanager
+    def _historical_conn(self):
+        """Borrow a pooled historical-database connection for the duration of the block."""
+        if self._historical_pool is None:
+            with self._pools_lock:
+                if self._historical_pool is None:
+                    self._historical_pool = psycopg2.pool.ThreadedConnectionPool(1, 4, self.historical_conn_str)
+        conn = self._historical_pool.getconn()
+        try:
+            yield conn
+        finally:
+            self._historical_pool.putconn(conn, close=bool(conn.closed))
+    
+    def fetch_last_seen(self) -> Optional[str]:
+        """Fetch the newest LAST_SEEN across all statement digests."""
+        try:
+            with self._mysql_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_LAST_SEEN_SQL)
+                    row = cur.fetchone()
+                    return str(row[0]) if row and row[0] is not None else None
+                    
+        except Exception as e:
+            print(f"Error fetching MySQL digest watermark: {e}")
+            return None
+    
+    def load_watermark(self) -> Optional[str]:
+        """Load the digest watermark stored by the last successful collection."""
+        try:
+            with self._historical_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_LOAD_WATERMARK_SQL, (self.state_key,))
+                    row = cur.fetchone()
+                conn.rollback()
+                return row[0] if row else None
+                    
+        except Exception as e:
+            print(f"Error loading collector watermark: {e}")
+            return None
     
     def collect_slow_query_stats(self) -> List[Dict[str, Any]]:
         """Collect slow query statistics from MySQL."""
         try:
-            with mysql.connector.connect(**self.mysql_config) as conn:
+            with self._mysql_conn() as conn:
                 with conn.cursor(dictionary=True) as cur:
-                    # Query performance_schema for slow queries
-                    query = """
-                    SELECT 
-                        DIGEST_TEXT as query_fingerprint,
-                        SQL_TEXT as query_sample,
-                        COUNT_STAR as calls,
-                        SUM_TIMER_WAIT / 1000000000000 as total_time_s,
-                        AVG_TIMER_WAIT / 1000000000000 as avg_time_s,
-                        MIN_TIMER_WAIT / 1000000000000 as min_time_s,
-                        MAX_TIMER_WAIT / 1000000000000 as max_time_s,
-                        SUM_ROWS_EXAMINED as rows_examined,
-                        SUM_ROWS_SENT as rows_sent
-                    FROM performance_schema.events_statements_summary_by_digest
-                    WHERE COUNT_STAR > 0
-                    ORDER BY SUM_TIMER_WAIT DESC
-                    LIMIT 100
-                    """
-                    
-                    cur.execute(query)
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        row['database_name'] = self.target_db_name
-                        results.append(row)
-                    
-                    return results
+                    # Constant columns come back from the server, so rows need no per-row patching
+                    cur.execute(_SLOW_QUERY_SQL, (self.target_db_name, QUERY_SAMPLE_PREVIEW_CHARS))
+                    return cur.fetchall()
                     
         except Exception as e:
             print(f"Error collecting MySQL slow query stats: {e}")
             return []
     
+    def fetch_query_sample(self, digest: str) -> str:
+        """Fetch the full sample statement for one digest, e.g. slow_log_summary.digest.
+
+        performance_schema forgets digests on restart or truncation; None is returned then.
+        """
+        try:
+            with self._mysql_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_QUERY_SAMPLE_SQL, (digest,))
+                    row = cur.fetchone()
+                    return row[0] if row else None
+                    
+        except Exception as e:
+            print(f"Error fetching MySQL query sample: {e}")
+            return None
+    
     def collect_index_usage_stats(self) -> List[Dict[str, Any]]:
         """Collect index usage statistics from MySQL."""
         try:
-            with mysql.connector.connect(**self.mysql_config) as conn:
+            with self._mysql_conn() as conn:
                 with conn.cursor(dictionary=True) as cur:
-                    # Query sys.schema_unused_indexes for unused indexes
-                    query = """
-                    SELECT 
-                        object_schema as schema_name,
-                        object_name as table_name,
-                        index_name,
-                        0 as times_used,
-                        'Unknown' as size_pretty,
-                        0 as size_kb
-                    FROM sys.schema_unused_indexes
-                    WHERE object_schema = %s
-                    """
-                    
-                    cur.execute(query, (self.target_db_name,))
-                    results = []
+                    cur.execute(_UNUSED_INDEXES_SQL, (self.target_db_name, self.target_db_name))
+                    results = cur.fetchall()
                     
-                    for row in cur.fetchall():
-                        row['database_name'] = self.target_db_name
-                        row['database_type'] = 'mysql'
-                        results.append(row)
-                    
-                    # Also get used indexes from performance_schema
-                    used_indexes_query = """
-                    SELECT 
-                        OBJECT_SCHEMA as schema_name,
-                        OBJECT_NAME as table_name,
-                        INDEX_NAME as index_name,
-                        COUNT_FETCH + COUNT_INSERT + COUNT_UPDATE + COUNT_DELETE as times_used,
-                        'Unknown' as size_pretty,
-                        0 as size_kb
-                    FROM performance_schema.table_io_waits_summary_by_index_usage
-                    WHERE OBJECT_SCHEMA = %s
-                    AND (COUNT_FETCH + COUNT_INSERT + COUNT_UPDATE + COUNT_DELETE) > 0
-                    """
-                    
-                    cur.execute(used_indexes_query, (self.target_db_name,))
-                    
-                    for row in cur.fetchall():
-                        row['database_name'] = self.target_db_name
-                        row['database_type'] = 'mysql'
-                        results.append(row)
+                    cur.execute(_USED_INDEXES_SQL, (self.target_db_name, self.target_db_name))
+                    results.extend(cur.fetchall())
                     
                     return results
                     
@@ -124,77 +260,98 @@ class MySQLStatsCollector:
             print(f"Error collecting MySQL index usage stats: {e}")
             return []
     
-    def store_slow_log_summary(self, stats: List[Dict[str, Any]]) -> bool:
-        """Store slow query statistics in historical database."""
+    def store_slow_log_summary(self, stats: List[Dict[str, Any]], conn=None) -> bool:
+        """Store slow query statistics in historical database.
+        
+        When conn is given the rows join its open transaction and the caller commits.
+        """
         if not stats:
             return False
             
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    insert_query = """
-                    INSERT INTO slow_log_summary (
-                        database_name, query_fingerprint, query_sample, total_time_s,
-                        calls, avg_time_s, min_time_s, max_time_s, rows_examined, rows_sent
-                    ) VALUES (
-                        %(database_name)s, %(query_fingerprint)s, %(query_sample)s,
-                        %(total_time_s)s, %(calls)s, %(avg_time_s)s, %(min_time_s)s,
-                        %(max_time_s)s, %(rows_examined)s, %(rows_sent)s
-                    )
-                    """
-                    
-                    cur.executemany(insert_query, stats)
+            if conn is not None:
+                self._copy_slow_log_summary(conn, stats)
+            else:
+                with self._historical_conn() as conn:
+                    self._copy_slow_log_summary(conn, stats)
                     conn.commit()
-                    
-                    print(f"✅ Stored {len(stats)} slow query summaries")
-                    return True
+            
+            print(f"✅ Stored {len(stats)} slow query summaries")
+            return True
                     
         except Exception as e:
             print(f"Error storing slow log summary: {e}")
             return False
     
-    def store_index_usage_snapshots(self, stats: List[Dict[str, Any]]) -> bool:
-        """Store index usage statistics in historical database."""
+    def _copy_slow_log_summary(self, conn, stats: List[Dict[str, Any]]):
+        with conn.cursor() as cur:
+            # COPY streams the whole batch in one command
+            copy_rows(cur, 'slow_log_summary', _SLOW_LOG_COLUMNS, stats)
+    
+    def store_index_usage_snapshots(self, stats: List[Dict[str, Any]], conn=None) -> bool:
+        """Store index usage statistics in historical database.
+        
+        When conn is given the rows join its open transaction and the caller commits.
+        """
         if not stats:
             return False
             
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    insert_query = """
-                    INSERT INTO index_usage_snapshots (
-                        database_name, database_type, table_name, index_name,
-                        times_used, index_size_kb
-                    ) VALUES (
-                        %(database_name)s, %(database_type)s, %(table_name)s,
-                        %(index_name)s, %(times_used)s, %(size_kb)s
-                    )
-                    """
-                    
-                    cur.executemany(insert_query, stats)
+            if conn is not None:
+                self._copy_index_usage_snapshots(conn, stats)
+            else:
+                with self._historical_conn() as conn:
+                    self._copy_index_usage_snapshots(conn, stats)
                     conn.commit()
-                    
-                    print(f"✅ Stored {len(stats)} index usage snapshots")
-                    return True
+            
+            print(f"✅ Stored {len(stats)} index usage snapshots")
+            return True
                     
         except Exception as e:
             print(f"Error storing index usage snapshots: {e}")
             return False
     
+    def _copy_index_usage_snapshots(self, conn, stats: List[Dict[str, Any]]):
+        with conn.cursor() as cur:
+            copy_rows(cur, 'index_usage_snapshots', _INDEX_USAGE_COLUMNS, stats,
+                      keys=_INDEX_USAGE_KEYS)
+    
     def collect_and_store(self) -> bool:
         """Main method to collect and store all statistics."""
         print(f"🔍 Collecting MySQL statistics from {self.target_db_name}")
         print(f"📊 Storing in historical database: {self.historical_db_name}")
         
-        # Collect slow query statistics
-        slow_query_stats = self.collect_slow_query_stats()
-        if slow_query_stats:
-            self.store_slow_log_summary(slow_query_stats)
+        # Skip the digest scan entirely when no statement has run since the last collection
+        last_seen = self.fetch_last_seen()
+        if last_seen is not None and last_seen == self.load_watermark():
+            print(f"⏭️  No new statement activity since {last_seen}, nothing to collect")
+            return True
+        
+        # The two collections are independent, so run them side by side;
+        # each worker borrows its own pooled connection
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            slow_query_job = executor.submit(self.collect_slow_query_stats)
+            index_job = executor.submit(self.collect_index_usage_stats)
+            slow_query_stats = slow_query_job.result()
+            index_stats = index_job.result()
         
-        # Collect index usage statistics
-        index_stats = self.collect_index_usage_stats()
-        if index_stats:
-            self.store_index_usage_snapshots(index_stats)
+        if slow_query_stats or index_stats:
+            # Both batches share one transaction, so a snapshot costs a single commit
+            # and is never stored half-way
+            try:
+                with self._historical_conn() as conn:
+                    stored = ((not slow_query_stats or self.store_slow_log_summary(slow_query_stats, conn)) and
+                              (not index_stats or self.store_index_usage_snapshots(index_stats, conn)))
+                    if stored:
+                        if last_seen is not None:
+                            # Saved with the snapshot, so a failed store is retried next run
+                            with conn.cursor() as cur:
+                                cur.execute(_SAVE_WATERMARK_SQL, (self.state_key, last_seen))
+                        conn.commit()
+                    else:
+                        conn.rollback()
+            except Exception as e:
+                print(f"Error storing statistics: {e}")
         
         print(f"✅ Collection completed at {datetime.now()}")
         return True
@@ -210,10 +367,9 @@ def main():
     
     args = parser.parse_args()
     
-    collector = MySQLStatsCollector(args.target_db, args.historical_db)
-    
     try:
-        success = collector.collect_and_store()
+        with MySQLStatsCollector(args.target_db, args.historical_db) as collector:
+            success = collector.collect_and_store()
         if success:
             print("🎉 MySQL statistics collection completed successfully")
             sys.exit(0)
@@ -5,17 +5,86 @@ Collects query performance statistics from pg_stat_statements and stores them in
 """
 
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import make_dsn, parse_dsn
 import sys
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Any
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.storage.bulk_copy import copy_rows
 from src.config.database_config import get_database_config, get_historical_postgres_connection_string
 
+# Resolved once at import and shared by every collector instance
+_DB_CONFIG = get_database_config()
+_BASE_POSTGRES_DSN = parse_dsn(_DB_CONFIG.get_postgres_connection_string())
+
+# SQL is built once at import and reused by every collection.
+# Top statements from pg_stat_statements
+_QUERY_STATS_SQL = """
+    SELECT 
+        %s as database_name,
+        queryid as query_id,
+        query as query_text,
+        calls,
+        total_exec_time as total_exec_time_ms,
+        mean_exec_time as mean_exec_time_ms,
+        rows,
+        shared_blks_hit,
+        shared_blks_read,
+        shared_blks_written,
+        local_blks_hit,
+        local_blks_read,
+        local_blks_written,
+        temp_blks_read,
+        temp_blks_written,
+        blk_read_time,
+        blk_write_time
+    FROM pg_stat_statements 
+    WHERE calls > 0
+    ORDER BY total_exec_time DESC
+    LIMIT 100
+"""
+
+# Index usage from pg_stat_user_indexes
+_INDEX_STATS_SQL = """
+    SELECT 
+        %s as database_name,
+        'postgresql' as database_type,
+        schemaname as schema_name,
+        relname as table_name,
+        indexrelname as index_name,
+        idx_scan as times_used,
+        pg_size_pretty(pg_relation_size(indexrelid)) as size_pretty,
+        pg_relation_size(indexrelid) / 1024 as size_kb
+    FROM pg_stat_user_indexes
+    ORDER BY idx_scan ASC
+"""
+
+_QUERY_SNAPSHOT_COLUMNS = (
+    'database_name', 'query_id', 'query_text', 'calls', 'total_exec_time_ms',
+    'mean_exec_time_ms', 'rows', 'shared_blks_hit', 'shared_blks_read',
+    'shared_blks_written', 'local_blks_hit', 'local_blks_read',
+    'local_blks_written', 'temp_blks_read', 'temp_blks_written',
+    'blk_read_time', 'blk_write_time'
+)
+_INDEX_USAGE_COLUMNS = ('database_name', 'database_type', 'table_name', 'index_name',
+                        'times_used', 'index_size_kb')
+_INDEX_USAGE_KEYS = ('database_name', 'database_type', 'table_name', 'index_name',
+                     'times_used', 'size_kb')
+
+def _postgres_dsn_for(db_name: str) -> str:
+    """Build a DSN for another database, keeping every other connection parameter."""
+    return make_dsn(**{**_BASE_POSTGRES_DSN, 'dbname': db_name})
+
 class PostgreSQLStatsCollector:
     """Collects PostgreSQL performance statistics."""
     
@@ -23,55 +92,52 @@ class PostgreSQLStatsCollector:
         """Initialize the collector."""
         self.target_db_name = target_db_name
         self.historical_db_name = historical_db_name
-        self.db_config = get_database_config()
+        self.db_config = _DB_CONFIG
         
         # Connection strings
-        self.target_conn_str = self.db_config.get_postgres_connection_string().replace(
-            f"/{self.db_config.get_postgres_config()['database']}", 
-            f"/{target_db_name}"
-        )
+        self.target_conn_str = _postgres_dsn_for(target_db_name)
         self.historical_conn_str = get_historical_postgres_connection_string(historical_db_name)
+        
+        # Connection pools, created on first use and shared by all collect/store calls
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close every pooled connection."""
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.closeall()
+            self._pools.clear()
+    
+    @contextmanager
+    def _conn(self, dsn: str):
+        """Borrow a pooled connection to dsn for the duration of the block."""
+        pool = self._pools.get(dsn)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.get(dsn)
+                if pool is None:
+                    pool = self._pools[dsn] = psycopg2.pool.ThreadedConnectionPool(1, 4, dsn)
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
     
     def collect_query_stats(self) -> List[Dict[str, Any]]:
         """Collect query statistics from pg_stat_statements."""
         try:
-            with psycopg2.connect(self.target_conn_str) as conn:
-                with conn.cursor() as cur:
-                    # Query pg_stat_statements for performance data
-                    query = """
-                    SELECT 
-                        queryid as query_id,
-                        query as query_text,
-                        calls,
-                        total_exec_time as total_exec_time_ms,
-                        mean_exec_time as mean_exec_time_ms,
-                        rows,
-                        shared_blks_hit,
-                        shared_blks_read,
-                        shared_blks_written,
-                        local_blks_hit,
-                        local_blks_read,
-                        local_blks_written,
-                        temp_blks_read,
-                        temp_blks_written,
-                        blk_read_time,
-                        blk_write_time
-                    FROM pg_stat_statements 
-                    WHERE calls > 0
-                    ORDER BY total_exec_time DESC
-                    LIMIT 100
-                    """
-                    
-                    cur.execute(query)
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        result['database_name'] = self.target_db_name
-                        results.append(result)
-                    
-                    return results
+            with self._conn(self.target_conn_str) as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Constant columns come back from the server, so rows need no per-row patching
+                    cur.execute(_QUERY_STATS_SQL, (self.target_db_name,))
+                    return cur.fetchall()
                     
         except Exception as e:
             print(f"Error collecting PostgreSQL stats: {e}")
@@ -80,114 +146,120 @@ class PostgreSQLStatsCollector:
     def collect_index_usage_stats(self) -> List[Dict[str, Any]]:
         """Collect index usage statistics."""
         try:
-            with psycopg2.connect(self.target_conn_str) as conn:
-                with conn.cursor() as cur:
-                    # Query pg_stat_user_indexes for index usage
-                    query = """
-                    SELECT 
-                        schemaname as schema_name,
-                        relname as table_name,
-                        indexrelname as index_name,
-                        idx_scan as times_used,
-                        pg_size_pretty(pg_relation_size(indexrelid)) as size_pretty,
-                        pg_relation_size(indexrelid) / 1024 as size_kb
-                    FROM pg_stat_user_indexes
-                    ORDER BY idx_scan ASC
-                    """
-                    
-                    cur.execute(query)
-                    columns = [desc[0] for desc in cur.description]
-                    results = []
-                    
-                    for row in cur.fetchall():
-                        result = dict(zip(columns, row))
-                        result['database_name'] = self.target_db_name
-                        result['database_type'] = 'postgresql'
-                        results.append(result)
-                    
-                    return results
+            with self._conn(self.target_conn_str) as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(_INDEX_STATS_SQL, (self.target_db_name,))
+                    return cur.fetchall()
                     
         except Exception as e:
             print(f"Error collecting index usage stats: {e}")
             return []
     
-    def store_query_snapshots(self, stats: List[Dict[str, Any]]) -> bool:
-        """Store query statistics in historical database."""
+    def store_query_snapshots(self, stats: List[Dict[str, Any]], conn=None) -> bool:
+        """Store query statistics in historical database.
+        
+        When conn is given the rows join its open transaction and the caller commits.
+        """
         if not stats:
             return False
             
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    insert_query = """
-                    INSERT INTO query_snapshots (
-                        database_name, query_id, query_text, calls, total_exec_time_ms,
-                        mean_exec_time_ms, rows, shared_blks_hit, shared_blks_read,
-                        shared_blks_written, local_blks_hit, local_blks_read,
-                        local_blks_written, temp_blks_read, temp_blks_written,
-                        blk_read_time, blk_write_time
-                    ) VALUES (
-                        %(database_name)s, %(query_id)s, %(query_text)s, %(calls)s,
-                        %(total_exec_time_ms)s, %(mean_exec_time_ms)s, %(rows)s,
-                        %(shared_blks_hit)s, %(shared_blks_read)s, %(shared_blks_written)s,
-                        %(local_blks_hit)s, %(local_blks_read)s, %(local_blks_written)s,
-                        %(temp_blks_read)s, %(temp_blks_written)s, %(blk_read_time)s,
-                        %(blk_write_time)s
-                    )
-                    """
-                    
-                    cur.executemany(insert_query, stats)
+            if conn is not None:
+                self._copy_query_snapshots(conn, stats)
+            else:
+                with self._conn(self.historical_conn_str) as conn:
+                    self._copy_query_snapshots(conn, stats)
                     conn.commit()
-                    
-                    print(f"✅ Stored {len(stats)} query snapshots")
-                    return True
+            
+            print(f"✅ Stored {len(stats)} query snapshots")
+            return True
                     
         except Exception as e:
             print(f"Error storing query snapshots: {e}")
             return False
     
-    def store_index_usage_snapshots(self, stats: List[Dict[str, Any]]) -> bool:
-        """Store index usage statistics in historical database."""
+    def _copy_query_snapshots(self, conn, stats: List[Dict[str, Any]]):
+        with conn.cursor() as cur:
+            # COPY streams the whole batch in one command
+            copy_rows(cur, 'query_snapshots', _QUERY_SNAPSHOT_COLUMNS, stats)
+    
+    def store_index_usage_snapshots(self, stats: List[Dict[str, Any]], conn=None) -> bool:
+        """Store index usage statistics in historical database.
+        
+        When conn is given the rows join its open transaction and the caller commits.
+        """
         if not stats:
             return False
             
         try:
-            with psycopg2.connect(self.historical_conn_str) as conn:
-                with conn.cursor() as cur:
-                    insert_query = """
-                    INSERT INTO index_usage_snapshots (
-                        database_name, database_type, table_name, index_name,
-                        times_used, index_size_kb
-                    ) VALUES (
-                        %(database_name)s, %(database_type)s, %(table_name)s,
-                        %(index_name)s, %(times_used)s, %(size_kb)s
-                    )
-                    """
-                    
-                    cur.executemany(insert_query, stats)
+            if conn is not None:
+                self._copy_index_usage_snapshots(conn, stats)
+            else:
+                with self._conn(self.historical_conn_str) as conn:
+                    self._copy_index_usage_snapshots(conn, stats)
                     conn.commit()
-                    
-                    print(f"✅ Stored {len(stats)} index usage snapshots")
-                    return True
+            
+            print(f"✅ Stored {len(stats)} index usage snapshots")
+            return True
                     
         except Exception as e:
             print(f"Error storing index usage snapshots: {e}")
             return False
     
+    def _copy_index_usage_snapshots(self, conn, stats: List[Dict[str, Any]]):
+        with conn.cursor() as cur:
+            copy_rows(cur, 'index_usage_snapshots', _INDEX_USAGE_COLUMNS, stats,
+                      keys=_INDEX_USAGE_KEYS)
+    
+    def refresh_trend_views(self) -> bool:
+        """Refresh the materialized query trends after new snapshots are stored."""
+        try:
+            with self._conn(self.historical_conn_str) as conn:
+                # REFRESH ... CONCURRENTLY cannot run inside a transaction block
+                conn.autocommit = True
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY query_performance_trends_mv")
+                finally:
+                    conn.autocommit = False
+            
+            print("✅ Refreshed query performance trends")
+            return True
+                    
+        except Exception as e:
+            print(f"Error refreshing trend views: {e}")
+            return False
+    
     def collect_and_store(self) -> bool:
         """Main method to collect and store all statistics."""
         print(f"🔍 Collecting PostgreSQL statistics from {self.target_db_name}")
         print(f"📊 Storing in historical database: {self.historical_db_name}")
         
-        # Collect query statistics
-        query_stats = self.collect_query_stats()
-        if query_stats:
-            self.store_query_snapshots(query_stats)
+        # The two collections are independent, so run them side by side;
+        # each worker borrows its own pooled connection
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            query_job = executor.submit(self.collect_query_stats)
+            index_job = executor.submit(self.collect_index_usage_stats)
+            query_stats = query_job.result()
+            index_stats = index_job.result()
         
-        # Collect index usage statistics
-        index_stats = self.collect_index_usage_stats()
-        if index_stats:
-            self.store_index_usage_snapshots(index_stats)
+        if query_stats or index_stats:
+            # Both batches share one transaction, so a snapshot costs a single commit
+            # and is never stored half-way
+            try:
+                with self._conn(self.historical_conn_str) as conn:
+                    stored = ((not query_stats or self.store_query_snapshots(query_stats, conn)) and
+                              (not index_stats or self.store_index_usage_snapshots(index_stats, conn)))
+                    if stored:
+                        conn.commit()
+                    else:
+                        conn.rollback()
+            except Exception as e:
+                print(f"Error storing statistics: {e}")
+                stored = False
+            
+            if stored and query_stats:
+                self.refresh_trend_views()
         
         print(f"✅ Collection completed at {datetime.now()}")
         return True
@@ -203,10 +275,9 @@ def main():
     
     args = parser.parse_args()
     
-    collector = PostgreSQLStatsCollector(args.target_db, args.historical_db)
-    
     try:
-        success = collector.collect_and_store()
+        with PostgreSQLStatsCollector(args.target_db, args.historical_db) as collector:
+            success = collector.collect_and_store()
         if success:
             print("🎉 PostgreSQL statistics collection completed successfully")
             sys.exit(0)
@@ -9,7 +9,8 @@ import mysql.connector
 import json
 import sys
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional
 
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,27 +20,107 @@ from src.config.database_config import get_database_config
 # Get database configuration
 db_config = get_database_config()
 POSTGRES_CONN_STR = db_config.get_postgres_connection_string()
-MYSQL_CONFIG = db_config.get_mysql_config()
+# connection_string is display-only; mysql.connector rejects it as a connect() argument
+MYSQL_CONFIG = {k: v for k, v in db_config.get_mysql_config().items() if k != 'connection_string'}
+
+# The collectors already read pg_stat_user_indexes and sys.schema_unused_indexes into
+# index_usage_snapshots; a run this recent is used instead of scanning the catalogs again
+HISTORICAL_DB_NAME = "performance_history"
+SNAPSHOT_MAX_AGE_MINUTES = 60
+
+# Newest collection run of one database, if it is recent enough
+_LATEST_SNAPSHOT_SQL = """
+    SELECT max(captured_at)
+    FROM index_usage_snapshots
+    WHERE database_type = %s AND database_name = %s
+      AND captured_at >= NOW() - make_interval(mins => %s)
+"""
+
+# Every row of a run is copied in one transaction and shares its captured_at,
+# so indexes dropped since an earlier run are left out
+_SNAPSHOT_UNUSED_SQL = """
+    SELECT table_name, index_name, times_used, index_size_kb
+    FROM index_usage_snapshots
+    WHERE database_type = %s AND database_name = %s AND captured_at = %s
+      AND times_used = 0
+    ORDER BY table_name, index_name
+"""
+
+def _pg_size_pretty(size: int) -> str:
+    """Format a byte count the way PostgreSQL's pg_size_pretty() does."""
+    if size < 10 * 1024:
+        return f"{size} bytes"
+    # Work in half-units so the final division rounds half up, as the server does
+    size >>= 9
+    for unit in ('kB', 'MB', 'GB', 'TB'):
+        if size < 20 * 1024 - 1 or unit == 'TB':
+            return f"{(size + 1) // 2} {unit}"
+        size >>= 10
+
+def _latest_unused_snapshot(database_type: str, database_name: str) -> Optional[List[tuple]]:
+    """
+    Read the unused indexes of database_name from its latest index_usage_snapshots run.
+    
+    Returns:
+        (table_name, index_name, times_used, index_size_kb) rows, or None when there is
+        no run newer than SNAPSHOT_MAX_AGE_MINUTES or the historical database is unreachable
+    """
+    try:
+        conn = psycopg2.connect(db_config.get_historical_postgres_connection_string(HISTORICAL_DB_NAME))
+        conn.autocommit = True
+        
+        with conn.cursor() as cur:
+            cur.execute(_LATEST_SNAPSHOT_SQL, (database_type, database_name, SNAPSHOT_MAX_AGE_MINUTES))
+            captured_at = cur.fetchone()[0]
+            if captured_at is None:
+                return None
+            
+            cur.execute(_SNAPSHOT_UNUSED_SQL, (database_type, database_name, captured_at))
+            return cur.fetchall()
+            
+    except Exception as e:
+        print(f"No recent index usage snapshot for {database_type} ({e}), querying the server directly")
+        return None
+    finally:
+        if 'conn' in locals():
+            conn.close()
 
 def find_postgres_unused_indexes() -> List[Dict[str, Any]]:
     """
-    Find unused indexes in PostgreSQL using pg_stat_user_indexes.
+    Find unused indexes in PostgreSQL.
+    
+    The latest index_usage_snapshots run is used when one is recent enough; otherwise
+    pg_stat_user_indexes is queried directly.
     
     Returns:
         List of unused index dictionaries
     """
+    snapshot = _latest_unused_snapshot('postgresql', db_config.get_postgres_config()['database'])
+    if snapshot is not None:
+        return [
+            {
+                'database': 'postgresql',
+                'table_name': table_name,
+                'index_name': index_name,
+                'times_used': times_used,
+                'index_size': _pg_size_pretty((index_size_kb or 0) * 1024),
+                'type': 'UNUSED_INDEX_CANDIDATE'
+            }
+            for table_name, index_name, times_used, index_size_kb in snapshot
+        ]
+    
     try:
         conn = psycopg2.connect(POSTGRES_CONN_STR)
         conn.autocommit = True
         
         with conn.cursor() as cur:
-            # Query for unused indexes
+            # Cheap catalog-only pass for unused indexes
             cur.execute("""
                 SELECT
                     relname AS table_name,
                     indexrelname AS index_name,
                     idx_scan AS times_used,
-                    pg_size_pretty(pg_relation_size(indexrelid)) AS index_size
+                    indexrelid
                 FROM
                     pg_stat_user_indexes
                 WHERE
@@ -50,16 +131,25 @@ def find_postgres_unused_indexes() -> List[Dict[str, Any]]:
             """)
             
             results = cur.fetchall()
+            
+            # Sizes need a stat() per relation, so only fetch them for the rows being reported
+            sizes = {}
+            if results:
+                cur.execute(
+                    "SELECT indexrelid, pg_relation_size(indexrelid) FROM pg_index WHERE indexrelid = ANY(%s)",
+                    ([row[3] for row in results],)
+                )
+                sizes = dict(cur.fetchall())
+            
             unused_indexes = []
             
-            for row in results:
-                table_name, index_name, times_used, index_size = row
+            for table_name, index_name, times_used, indexrelid in results:
                 unused_indexes.append({
                     'database': 'postgresql',
                     'table_name': table_name,
                     'index_name': index_name,
                     'times_used': times_used,
-                    'index_size': index_size,
+                    'index_size': _pg_size_pretty(sizes.get(indexrelid, 0)),
                     'type': 'UNUSED_INDEX_CANDIDATE'
                 })
             
@@ -74,11 +164,30 @@ def find_postgres_unused_indexes() -> List[Dict[str, Any]]:
 
 def find_mysql_unused_indexes() -> List[Dict[str, Any]]:
     """
-    Find unused indexes in MySQL using sys.schema_unused_indexes.
+    Find unused indexes in MySQL.
+    
+    The latest index_usage_snapshots run is used when one is recent enough; the collector
+    stores sys.schema_unused_indexes rows for its schema with times_used = 0. Otherwise
+    sys.schema_unused_indexes is queried directly.
     
     Returns:
         List of unused index dictionaries
     """
+    db_name = MYSQL_CONFIG['database']
+    snapshot = _latest_unused_snapshot('mysql', db_name)
+    if snapshot is not None:
+        return [
+            {
+                'database': 'mysql',
+                'db_name': db_name,
+                'table_name': table_name,
+                'index_name': index_name,
+                'times_used': 0,  # sys.schema_unused_indexes doesn't provide scan count
+                'type': 'UNUSED_INDEX_CANDIDATE'
+            }
+            for table_name, index_name, _, _ in snapshot
+        ]
+    
     try:
         conn = mysql.connector.connect(**MYSQL_CONFIG)
         
@@ -119,36 +228,37 @@ def find_mysql_unused_indexes() -> List[Dict[str, Any]]:
         if 'conn' in locals():
             conn.close()
 
-def generate_unused_index_recommendations(unused_indexes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+# Shared, immutable pieces of every unused-index recommendation
+_RATIONALE_TEMPLATES = {
+    'postgresql': "The index '{index_name}' on table '{table_name}' has been used {times_used} times. It may be a candidate for removal to save space ({index_size}) and improve write performance.",
+    'mysql': "The index '{index_name}' on table '{table_name}' in database '{db_name}' has not been used since the last server restart. It may be a candidate for removal to save space and improve write performance."
+}
+_IMPACT = 'Medium - Reduces storage overhead and improves write performance'
+_CAVEATS = (
+    "Please verify this index is not used for infrequent but important queries (e.g., annual reports) before dropping it.",
+    "Consider monitoring the application for any performance degradation after removal.",
+    "Backup the database before making schema changes."
+)
+
+def iter_unused_index_recommendations(unused_indexes: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
     """
-    Generate recommendations for unused indexes.
+    Yield a recommendation for each unused index.
     
     Args:
         unused_indexes: List of unused index dictionaries
         
-    Returns:
-        List of recommendation dictionaries
+    Yields:
+        Recommendation dictionaries
     """
-    recommendations = []
-    
-    for idx in unused_indexes:
-        if idx['database'] == 'postgresql':
-            rationale = f"The index '{idx['index_name']}' on table '{idx['table_name']}' has been used {idx['times_used']} times. It may be a candidate for removal to save space ({idx['index_size']}) and improve write performance."
-        else:  # MySQL
-            rationale = f"The index '{idx['index_name']}' on table '{idx['table_name']}' in database '{idx['db_name']}' has not been used since the last server restart. It may be a candidate for removal to save space and improve write performance."
-        
-        recommendation = {
+    return (
+        {
             'type': 'UNUSED_INDEX_CANDIDATE',
             'severity': 'MEDIUM',
             'rule_id': 'UNUSED_INDEX_001',
-            'rationale': rationale,
+            'rationale': _RATIONALE_TEMPLATES.get(idx['database'], _RATIONALE_TEMPLATES['mysql']).format_map(idx),
             'suggested_action': f"DROP INDEX {idx['index_name']} ON {idx['table_name']};",
-            'estimated_impact': 'Medium - Reduces storage overhead and improves write performance',
-            'caveats': [
-                "Please verify this index is not used for infrequent but important queries (e.g., annual reports) before dropping it.",
-                "Consider monitoring the application for any performance degradation after removal.",
-                "Backup the database before making schema changes."
-            ],
+            'estimated_impact': _IMPACT,
+            'caveats': _CAVEATS,
             'evidence': {
                 'database': idx['database'],
                 'table_name': idx['table_name'],
@@ -156,10 +266,43 @@ def generate_unused_index_recommendations(unused_indexes: List[Dict[str, Any]])
                 'times_used': idx['times_used']
             }
         }
+        for idx in unused_indexes
+    )
+
+def generate_unused_index_recommendations(unused_indexes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Generate recommendations for unused indexes.
+    
+    Args:
+        unused_indexes: List of unused index dictionaries
         
-        recommendations.append(recommendation)
+    Returns:
+        List of recommendation dictionaries
+    """
+    return list(iter_unused_index_recommendations(unused_indexes))
+
+def write_results_json(path: str, unused_indexes: List[Dict[str, Any]], recommendations, summary: Dict[str, Any]):
+    """
+    Write the analysis results as compact JSON, streaming recommendations one at a time.
     
-    return recommendations
+    Args:
+        path: Output file path
+        unused_indexes: List of unused index dictionaries
+        recommendations: Iterable of recommendation dictionaries (may be a generator)
+        summary: Summary counts
+    """
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    with open(path, 'w') as f:
+        f.write('{"unused_indexes":')
+        f.write(dumps(unused_indexes))
+        f.write(',"recommendations":[')
+        for i, recommendation in enumerate(recommendations):
+            if i:
+                f.write(',')
+            f.write(dumps(recommendation))
+        f.write('],"summary":')
+        f.write(dumps(summary))
+        f.write('}')
 
 def format_unused_index_report(recommendations: List[Dict[str, Any]]) -> str:
     """
@@ -194,15 +337,24 @@ def format_unused_index_report(recommendations: List[Dict[str, Any]]) -> str:
     
     return "\n".join(output)
 
-def main():
+def main(argv: List[str] = None):
     """Main function to run the unused index analysis."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Find unused PostgreSQL and MySQL indexes")
+    parser.add_argument('--report', action='store_true', help='Print the formatted recommendation report')
+    args = parser.parse_args(argv)
+    
     print("--- Unused Index Analysis ---")
     print("Scanning both PostgreSQL and MySQL for unused indexes...")
     print()
     
-    # Find unused indexes in both databases
-    postgres_unused = find_postgres_unused_indexes()
-    mysql_unused = find_mysql_unused_indexes()
+    # Find unused indexes in both databases; the two servers are queried concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        postgres_job = executor.submit(find_postgres_unused_indexes)
+        mysql_job = executor.submit(find_mysql_unused_indexes)
+        postgres_unused = postgres_job.result()
+        mysql_unused = mysql_job.result()
     
     # Combine results
     all_unused = postgres_unused + mysql_unused
@@ -212,26 +364,26 @@ def main():
     print(f"Total: {len(all_unused)} unused indexes")
     print()
     
-    # Generate recommendations
-    recommendations = generate_unused_index_recommendations(all_unused)
+    summary = {
+        'total_unused': len(all_unused),
+        'postgres_count': len(postgres_unused),
+        'mysql_count': len(mysql_unused)
+    }
     
-    # Format and display report
-    report = format_unused_index_report(recommendations)
-    print(report)
+    if not all_unused:
+        # Nothing to recommend, so skip generation and formatting entirely
+        if args.report:
+            print(format_unused_index_report([]))
+        recommendations = []
+    elif args.report:
+        # The report needs the full list; reuse it for the JSON file
+        recommendations = generate_unused_index_recommendations(all_unused)
+        print(format_unused_index_report(recommendations))
+    else:
+        recommendations = iter_unused_index_recommendations(all_unused)
     
     # Save results to file
-    results = {
-        'unused_indexes': all_unused,
-        'recommendations': recommendations,
-        'summary': {
-            'total_unused': len(all_unused),
-            'postgres_count': len(postgres_unused),
-            'mysql_count': len(mysql_unused)
-        }
-    }
-    
-    with open('artifacts/unused_indexes_analysis.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    write_results_json('artifacts/unused_indexes_analysis.json', all_unused, recommendations, summary)
     
     print(f"Results saved to: artifacts/unused_indexes_analysis.json")
 
@@ -5,10 +5,18 @@ Simulates the effect of adding an index using HypoPG extension
 """
 
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import register_default_json, register_default_jsonb
 import json
+import orjson
 import re
+import threading
 import time
-from typing import Dict, Tuple, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Tuple, Optional
 import sys
 import os
 
@@ -21,57 +29,266 @@ try:
 except ImportError:
     USE_DB_CONFIG = False
 
-def get_connection():
-    """Get PostgreSQL database connection"""
-    global USE_DB_CONFIG
-    
+@lru_cache(maxsize=1)
+def _postgres_params() -> Dict:
+    """Resolve the PostgreSQL connection parameters once per process"""
     if USE_DB_CONFIG:
         try:
-            db_config = get_database_config()
-            return psycopg2.connect(
-                host=db_config.get_postgres_config()['host'],
-                port=db_config.get_postgres_config()['port'],
-                user=db_config.get_postgres_config()['user'],
-                password=db_config.get_postgres_config()['password'],
-                dbname=db_config.get_postgres_config()['database']
-            )
+            pg_config = get_database_config().get_postgres_config()
+            return {
+                'host': pg_config['host'],
+                'port': pg_config['port'],
+                'user': pg_config['user'],
+                'password': pg_config['password'],
+                'dbname': pg_config['database']
+            }
         except Exception as e:
             print(f"Error getting database config: {e}")
-            USE_DB_CONFIG = False
     
-    if not USE_DB_CONFIG:
-        return psycopg2.connect(
-            host="localhost",
-            port="5432",
-            user="postgres",
-            password="postgres",
-            dbname="postgres"
-        )
+    return {
+        'host': "localhost",
+        'port': "5432",
+        'user': "postgres",
+        'password': "postgres",
+        'dbname': "postgres"
+    }
+
+class _HypoPGConnection(psycopg2.extensions.connection):
+    """Pooled connection that remembers its HypoPG session state."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # pg_temp function definitions already committed on this session
+        self.temp_functions = set()
+        # Set once the extension is known to exist, so later calls skip the catalog check
+        self.hypopg_ready = False
+        # EXPLAIN plans come back as json; decode them with orjson instead of the stdlib
+        register_default_json(self, loads=orjson.loads)
+        register_default_jsonb(self, loads=orjson.loads)
+
+# Timings only; BUFFERS would instrument every buffer access for counters nobody reads
+EXPLAIN_OPTIONS = "ANALYZE, FORMAT JSON"
+
+# CREATE and ALTER write new pg_class rows, which moves the newest xmin. DROP only deletes
+# rows, so the row count and oid sum are part of the version too. VACUUM and ANALYZE update
+# pg_class in place and keep its xmin, so the newest analyze time is included as well
+_SCHEMA_VERSION_SQL = """
+SELECT current_database(), current_setting('search_path'), c.newest_xmin, c.relations, c.oid_sum,
+       (SELECT max(greatest(last_analyze, last_autoanalyze))::text FROM pg_stat_user_tables)
+FROM (SELECT max(xmin::text::bigint) AS newest_xmin, count(*) AS relations, sum(oid::bigint) AS oid_sum
+      FROM pg_class) c
+"""
+
+def schema_version(cur) -> Tuple:
+    """Return (database, search_path, newest pg_class xmin, pg_class row count and oid sum,
+    newest analyze time) for cur's database."""
+    cur.execute(_SCHEMA_VERSION_SQL)
+    return tuple(cur.fetchone())
+
+# Room for a full set of batch sessions plus the single-pair callers sharing the pool
+POOL_MAX_CONNECTIONS = 8
+BATCH_SESSIONS = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection():
+    """Get PostgreSQL database connection from the shared pool; hand it back with release_connection()"""
+    global _pool
+    
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, POOL_MAX_CONNECTIONS, connection_factory=_HypoPGConnection, **_postgres_params()
+                )
+    return _pool.getconn()
+
+def release_connection(conn):
+    """Return a connection from get_connection() to the pool"""
+    # The pool rolls back any open transaction; broken connections are discarded
+    _pool.putconn(conn, close=bool(conn.closed))
+
+# CREATE INDEX index_name ON table_name
+_CREATE_INDEX_RE = re.compile(r'CREATE\s+INDEX\s+(\w+)\s+ON\s+(\w+)', re.IGNORECASE)
+
+def extract_index_target_from_sql(sql: str) -> Tuple[Optional[str], Optional[str]]:
+    """Extract (index_name, table_name) from CREATE INDEX SQL statement"""
+    match = _CREATE_INDEX_RE.search(sql)
+    if match:
+        return match.group(1), match.group(2)
+    return None, None
 
 def extract_index_name_from_sql(sql: str) -> Optional[str]:
     """Extract index name from CREATE INDEX SQL statement"""
-    # Pattern to match CREATE INDEX index_name ON table_name
-    pattern = r'CREATE\s+INDEX\s+(\w+)\s+ON\s+(\w+)'
-    match = re.search(pattern, sql, re.IGNORECASE)
-    if match:
-        return match.group(1)
-    return None
+    return extract_index_target_from_sql(sql)[0]
 
 def extract_table_name_from_sql(sql: str) -> Optional[str]:
     """Extract table name from CREATE INDEX SQL statement"""
-    pattern = r'CREATE\s+INDEX\s+\w+\s+ON\s+(\w+)'
-    match = re.search(pattern, sql, re.IGNORECASE)
-    if match:
-        return match.group(1)
-    return None
+    return extract_index_target_from_sql(sql)[1]
+
+# Session-local helper that runs the whole HypoPG comparison server-side, so the extension
+# check, both EXPLAINs and the hypothetical index cost a single round trip
+_HYPOPG_COMPARE_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.hypopg_compare(
+    query text, index_sql text, measured_before json, baseline_options text, hypopg_known boolean,
+    OUT hypopg_available boolean, OUT hypopg_error text,
+    OUT before_plan json, OUT after_plan json
+) LANGUAGE plpgsql AS $fn$
+DECLARE
+    hypo_oid oid;
+BEGIN
+    hypopg_available := hypopg_known;
+    IF NOT hypopg_available THEN
+        hypopg_available := EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'hypopg');
+    END IF;
+    IF NOT hypopg_available THEN
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS hypopg;
+            hypopg_available := true;
+        EXCEPTION WHEN others THEN
+            hypopg_error := SQLERRM;
+            RETURN;
+        END;
+    END IF;
+    
+    -- A batch passes the baseline it already measured for this query
+    before_plan := measured_before;
+    IF before_plan IS NULL THEN
+        EXECUTE 'EXPLAIN (' || baseline_options || ') ' || query INTO before_plan;
+    END IF;
+    SELECT indexrelid INTO hypo_oid FROM hypopg_create_index(index_sql);
+    -- Hypothetical indexes are only visible to plain EXPLAIN, never to ANALYZE
+    EXECUTE 'EXPLAIN (FORMAT JSON) ' || query INTO after_plan;
+    PERFORM hypopg_drop_index(hypo_oid);
+END
+$fn$;
+"""
+
+_HYPOPG_COMPARE_CALL = """
+SELECT * FROM pg_temp.hypopg_compare(%s, %s, %s::json, %s, %s);
+"""
+
+# Runs a whole list of (query, index) pairs in one call; a query's baseline plan
+# is measured once and shared by every candidate index for it
+_HYPOPG_BATCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.hypopg_compare_batch(
+    queries text[], index_sqls text[], baseline_options text, hypopg_known boolean
+) RETURNS TABLE (
+    hypopg_available boolean, hypopg_error text, before_plan json, after_plan json
+) LANGUAGE plpgsql AS $fn$
+DECLARE
+    baselines jsonb := '{}';
+BEGIN
+    FOR i IN 1 .. coalesce(array_length(queries, 1), 0) LOOP
+        SELECT c.hypopg_available, c.hypopg_error, c.before_plan, c.after_plan
+        INTO hypopg_available, hypopg_error, before_plan, after_plan
+        FROM pg_temp.hypopg_compare(
+            queries[i], index_sqls[i], (baselines -> queries[i])::json,
+            baseline_options, hypopg_known
+        ) c;
+        hypopg_known := hypopg_available;
+        IF before_plan IS NOT NULL THEN
+            baselines := baselines || jsonb_build_object(queries[i], before_plan);
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END
+$fn$;
+"""
+
+_HYPOPG_BATCH_CALL = """
+SELECT * FROM pg_temp.hypopg_compare_batch(%s, %s, %s, %s);
+"""
+
+def _session_sql(conn, call_sql: str, *functions: str) -> str:
+    """Prefix call_sql with the temp function definitions this session does not have yet"""
+    return "".join(f for f in functions if f not in conn.temp_functions) + call_sql
+
+def _explain_options(collect_buffers: bool) -> str:
+    """EXPLAIN options for a measured baseline; BUFFERS only when its counters are wanted"""
+    return "ANALYZE, BUFFERS, FORMAT JSON" if collect_buffers else EXPLAIN_OPTIONS
+
+# Fields of an EXPLAIN (ANALYZE) plan and its top node, fetched in one C call each
+_PLAN_TIMES = itemgetter('Execution Time', 'Planning Time')
+_NODE_ACTUALS = itemgetter('Total Cost', 'Actual Rows')
+
+class PlanMetrics(NamedTuple):
+    """Simulation metrics of one plan; _asdict() gives the API's metrics dict."""
+    execution_time_ms: float
+    planning_time_ms: float
+    total_cost: float
+    rows_returned: int
+    node_type: str
+
+def _plan_metrics(plan: Dict, elapsed_s: float) -> PlanMetrics:
+    """Pull the simulation metrics out of one EXPLAIN (FORMAT JSON) plan in a single pass."""
+    node = plan.get('Plan', {})
+    try:
+        execution_ms, planning_ms = _PLAN_TIMES(plan)
+    except KeyError:
+        # Plain EXPLAIN reports no timings
+        execution_ms, planning_ms = plan.get('Execution Time', elapsed_s * 1000), plan.get('Planning Time', 0)
+    try:
+        total_cost, rows = _NODE_ACTUALS(node)
+    except KeyError:
+        total_cost, rows = node.get('Total Cost', 0), node.get('Plan Rows', 0)
+    return PlanMetrics(execution_ms, planning_ms, total_cost, rows, node.get('Node Type', 'UNKNOWN'))
+
+def _hypopg_metrics(before_plan, after_plan, elapsed_s: float) -> Tuple[Dict, Dict]:
+    """Turn a baseline plan and a hypothetical-index plan into (before, after) metrics."""
+    before = _plan_metrics(before_plan[0], elapsed_s)
+    
+    # The hypothetical plan is never executed, so scale the measured baseline
+    # by how much the planner expects the index to cut the cost
+    after = _plan_metrics(after_plan[0], 0)
+    cost_ratio = after.total_cost / before.total_cost if before.total_cost else 1
+    after = after._replace(execution_time_ms=before.execution_time_ms * cost_ratio)
+    return before._asdict(), after._asdict()
+
+# Finished HypoPG simulations, keyed by the whitespace-normalized (query, index) pair and the
+# schema version (DDL and statistics refreshes) they ran against; literals keep their case
+# since they change the plan. The baseline is a measured timing, so entries also expire.
+SIMULATION_CACHE_SIZE = 4096
+SIMULATION_CACHE_TTL_S = 300
+_simulation_cache = OrderedDict()
+_simulation_cache_lock = threading.Lock()
+
+def _get_cached_simulation(key) -> Optional[Tuple[Dict, Dict]]:
+    with _simulation_cache_lock:
+        entry = _simulation_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, before_metrics, after_metrics = entry
+        if expires_at <= time.monotonic():
+            del _simulation_cache[key]
+            return None
+        _simulation_cache.move_to_end(key)
+    return dict(before_metrics), dict(after_metrics)
 
-def run_hypopg_simulation(query: str, recommended_action: str) -> Tuple[Dict, Dict]:
+def _put_cached_simulation(key, before_metrics: Dict, after_metrics: Dict):
+    with _simulation_cache_lock:
+        _simulation_cache[key] = (time.monotonic() + SIMULATION_CACHE_TTL_S,
+                                  dict(before_metrics), dict(after_metrics))
+        _simulation_cache.move_to_end(key)
+        if len(_simulation_cache) > SIMULATION_CACHE_SIZE:
+            _simulation_cache.popitem(last=False)
+
+def clear_simulation_cache():
+    """Forget every cached simulation result"""
+    with _simulation_cache_lock:
+        _simulation_cache.clear()
+
+def run_hypopg_simulation(query: str, recommended_action: str,
+                          collect_buffers: bool = False) -> Tuple[Dict, Dict]:
     """
     Simulate the effect of adding an index using HypoPG
     
     Args:
         query: The SQL query to test
         recommended_action: The CREATE INDEX statement to simulate
+        collect_buffers: Also collect buffer counters for the baseline plan. Off by default,
+            since instrumenting every buffer access slows the measured run down
         
     Returns:
         Tuple of (before_metrics, after_metrics)
@@ -81,71 +298,42 @@ def run_hypopg_simulation(query: str, recommended_action: str) -> Tuple[Dict, Di
         conn = get_connection()
         cur = conn.cursor()
         
-        # Check if HypoPG extension is available
-        try:
-            cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'hypopg';")
-            if not cur.fetchone():
-                # Try to create the extension
-                try:
-                    cur.execute("CREATE EXTENSION IF NOT EXISTS hypopg;")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Warning: Could not create HypoPG extension: {e}")
-                    # Fallback to basic simulation without HypoPG
-                    return run_basic_simulation(query, recommended_action, conn, cur)
-        except Exception as e:
-            print(f"Warning: Could not check HypoPG extension: {e}")
-            # Fallback to basic simulation without HypoPG
-            return run_basic_simulation(query, recommended_action, conn, cur)
-        
-        # Get baseline performance (before)
-        print(f"Running baseline query: {query[:100]}...")
-        start_time = time.time()
-        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
-        before_result = cur.fetchone()[0][0]
-        before_time = time.time() - start_time
-        
-        before_metrics = {
-            'execution_time_ms': before_result.get('Execution Time', before_time * 1000),
-            'planning_time_ms': before_result.get('Planning Time', 0),
-            'total_cost': before_result.get('Total Cost', 0),
-            'rows_returned': before_result.get('Plan', {}).get('Actual Rows', 0)
-        }
-        
         # Extract index details from recommendation
-        index_name = extract_index_name_from_sql(recommended_action)
-        table_name = extract_table_name_from_sql(recommended_action)
+        index_name, table_name = extract_index_target_from_sql(recommended_action)
         
         if not index_name or not table_name:
             raise ValueError("Could not extract index or table name from recommendation")
         
-        # Create hypothetical index
-        print(f"Creating hypothetical index: {index_name} on {table_name}")
-        cur.execute(f"SELECT * FROM hypopg_create_index('{recommended_action}');")
-        hypo_index_result = cur.fetchone()
+        # The same pair against unchanged schema and statistics simulates the same way
+        version = schema_version(cur)
+        simulation_key = (' '.join(query.split()), ' '.join(recommended_action.split()),
+                          collect_buffers, version)
+        cached_result = _get_cached_simulation(simulation_key)
+        if cached_result is not None:
+            return cached_result
         
-        if not hypo_index_result:
-            raise ValueError("Failed to create hypothetical index")
-        
-        hypo_index_id = hypo_index_result[0]
-        
-        # Get performance with hypothetical index (after)
-        print("Running query with hypothetical index...")
+        # Baseline plan, hypothetical index and plan with the index in one round trip
+        print(f"Running baseline query: {query[:100]}...")
+        print(f"Creating hypothetical index: {index_name} on {table_name}")
+        # The baseline is an ANALYZE measurement, so it is taken fresh every time
+        options = _explain_options(collect_buffers)
         start_time = time.time()
-        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
-        after_result = cur.fetchone()[0][0]
-        after_time = time.time() - start_time
+        cur.execute(_session_sql(conn, _HYPOPG_COMPARE_CALL, _HYPOPG_COMPARE_FUNCTION), (
+            query, recommended_action, None, options, conn.hypopg_ready
+        ))
+        hypopg_available, hypopg_error, before_plan, after_plan = cur.fetchone()
+        elapsed = time.time() - start_time
+        conn.commit()
+        conn.temp_functions.add(_HYPOPG_COMPARE_FUNCTION)
+        conn.hypopg_ready = bool(hypopg_available)
         
-        after_metrics = {
-            'execution_time_ms': after_result.get('Execution Time', after_time * 1000),
-            'planning_time_ms': after_result.get('Planning Time', 0),
-            'total_cost': after_result.get('Total Cost', 0),
-            'rows_returned': after_result.get('Plan', {}).get('Actual Rows', 0)
-        }
+        if not hypopg_available:
+            print(f"Warning: Could not create HypoPG extension: {hypopg_error}")
+            # Fallback to basic simulation without HypoPG
+            return run_basic_simulation(query, recommended_action, conn, cur, collect_buffers)
         
-        # Clean up hypothetical index
-        cur.execute(f"SELECT hypopg_drop_index({hypo_index_id});")
-        conn.commit()
+        before_metrics, after_metrics = _hypopg_metrics(before_plan, after_plan, elapsed)
+        _put_cached_simulation(simulation_key, before_metrics, after_metrics)
         
         print(f"Simulation complete. Before: {before_metrics['execution_time_ms']:.2f}ms, After: {after_metrics['execution_time_ms']:.2f}ms")
         
@@ -156,16 +344,99 @@ def run_hypopg_simulation(query: str, recommended_action: str) -> Tuple[Dict, Di
         # Fallback to basic simulation
         if conn:
             cur = conn.cursor()
-            return run_basic_simulation(query, recommended_action, conn, cur)
+            return run_basic_simulation(query, recommended_action, conn, cur, collect_buffers)
         else:
             raise e
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
 
-def run_basic_simulation(query: str, recommended_action: str, conn, cur) -> Tuple[Dict, Dict]:
+def _simulate_batch_session(items: List[Tuple[str, str]], indices: List[int],
+                            collect_buffers: bool) -> Dict[int, Tuple[Dict, Dict]]:
+    """Simulate items[i] for each i in indices on one pooled HypoPG session; failed pairs are left out"""
+    results = {}
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        
+        queries = [items[i][0] for i in indices]
+        actions = [items[i][1] for i in indices]
+        
+        options = _explain_options(collect_buffers)
+        start_time = time.time()
+        batch_functions = (_HYPOPG_COMPARE_FUNCTION, _HYPOPG_BATCH_FUNCTION)
+        cur.execute(_session_sql(conn, _HYPOPG_BATCH_CALL, *batch_functions), (
+            queries, actions, options, conn.hypopg_ready
+        ))
+        rows = cur.fetchall()
+        elapsed = time.time() - start_time
+        conn.commit()
+        conn.temp_functions.update(batch_functions)
+        conn.hypopg_ready = bool(rows and rows[-1][0])
+        
+        for i, (hypopg_available, hypopg_error, before_plan, after_plan) in zip(indices, rows):
+            if not hypopg_available:
+                print(f"Warning: Could not create HypoPG extension: {hypopg_error}")
+                break
+            results[i] = _hypopg_metrics(before_plan, after_plan, elapsed / len(rows))
+            
+    except Exception as e:
+        print(f"Error in HypoPG batch simulation: {e}")
+    finally:
+        if conn:
+            release_connection(conn)
+    return results
+
+def run_hypopg_batch(items: List[Tuple[str, str]], collect_buffers: bool = False,
+                     sessions: int = 1) -> List[Tuple[Dict, Dict]]:
+    """
+    Simulate many (query, CREATE INDEX) pairs over one or more HypoPG sessions
+    
+    Args:
+        items: List of (query, recommended_action) pairs
+        collect_buffers: Also collect buffer counters for the baseline plans
+        sessions: Pooled connections to spread the pairs over, at most BATCH_SESSIONS.
+            Each session is its own backend, so the candidates are planned in parallel;
+            each one measures its own baseline for the queries it was given
+        
+    Returns:
+        List of (before_metrics, after_metrics), in the order of items
+    """
+    if not items:
+        return []
+    
+    # Pairs HypoPG cannot take go through the single-item path and its fallbacks.
+    # Ordered by query, so contiguous shares repeat as few baselines as possible
+    batchable = sorted((i for i, (_, action) in enumerate(items) if all(extract_index_target_from_sql(action))),
+                       key=lambda i: items[i][0])
+    sessions = max(1, min(sessions, BATCH_SESSIONS, len(batchable)))
+    share = -(-len(batchable) // sessions)
+    shares = [batchable[start:start + share] for start in range(0, len(batchable), share)]
+    
+    simulated = {}
+    if shares:
+        print(f"Simulating {len(batchable)} hypothetical indexes across {len(shares)} HypoPG session(s)...")
+    if len(shares) == 1:
+        simulated = _simulate_batch_session(items, shares[0], collect_buffers)
+    elif shares:
+        with ThreadPoolExecutor(max_workers=len(shares)) as executor:
+            for session_results in executor.map(
+                lambda indices: _simulate_batch_session(items, indices, collect_buffers), shares
+            ):
+                simulated.update(session_results)
+    
+    return [simulated[i] if i in simulated else run_hypopg_simulation(*item, collect_buffers)
+            for i, item in enumerate(items)]
+
+def run_basic_simulation(query: str, recommended_action: str, conn, cur,
+                         collect_buffers: bool = False) -> Tuple[Dict, Dict]:
     """
     Fallback simulation without HypoPG - just run the query twice and estimate improvement
+    
+    The baseline skips BUFFERS unless collect_buffers is set; the reported execution
+    time includes the cost of that instrumentation, so leaving it off also keeps the
+    baseline closer to an uninstrumented run.
     """
     print("Running basic simulation (HypoPG not available)")
     
@@ -185,68 +456,50 @@ def run_basic_simulation(query: str, recommended_action: str, conn, cur) -> Tupl
         
         # Get baseline performance
         start_time = time.time()
-        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+        cur.execute(f"EXPLAIN ({_explain_options(collect_buffers)}) {query}")
         before_result = cur.fetchone()[0][0]
         before_time = time.time() - start_time
         
-        before_metrics = {
-            'execution_time_ms': before_result.get('Execution Time', before_time * 1000),
-            'planning_time_ms': before_result.get('Planning Time', 0),
-            'total_cost': before_result.get('Total Cost', 0),
-            'rows_returned': before_result.get('Plan', {}).get('Actual Rows', 0)
-        }
+        before = _plan_metrics(before_result, before_time)
+        before_metrics = before._asdict()
         
         # Estimate improvement based on query type and recommendation
         estimated_improvement = estimate_index_improvement(query, recommended_action, before_metrics)
         
-        after_metrics = {
-            'execution_time_ms': before_metrics['execution_time_ms'] * (1 - estimated_improvement),
-            'planning_time_ms': before_metrics['planning_time_ms'],
-            'total_cost': before_metrics['total_cost'] * 0.1,  # Assume 90% cost reduction
-            'rows_returned': before_metrics['rows_returned']
-        }
+        after = before._replace(
+            execution_time_ms=before.execution_time_ms * (1 - estimated_improvement),
+            total_cost=before.total_cost * 0.1  # Assume 90% cost reduction
+        )
         
-        return before_metrics, after_metrics
+        return before_metrics, after._asdict()
         
     except Exception as e:
         print(f"Error in basic simulation: {e}")
         return get_estimated_metrics(query, recommended_action)
 
+# Leading keywords of statements that cannot be explained
+_NOT_EXPLAINABLE = frozenset({
+    'COMMIT', 'ROLLBACK', 'BEGIN', 'START',
+    'SET', 'RESET', 'SHOW', 'EXPLAIN', 'VACUUM', 'ANALYZE',
+    'CREATE', 'DROP', 'ALTER', 'INSERT', 'UPDATE', 'DELETE'
+})
+
 def is_valid_for_explain(query: str) -> bool:
     """Check if query is valid for EXPLAIN"""
-    query_upper = query.upper().strip()
-    
-    # Queries that cannot be explained
-    invalid_queries = [
-        'COMMIT', 'ROLLBACK', 'BEGIN', 'START TRANSACTION',
-        'SET', 'RESET', 'SHOW', 'EXPLAIN', 'VACUUM', 'ANALYZE',
-        'CREATE', 'DROP', 'ALTER', 'INSERT', 'UPDATE', 'DELETE'
-    ]
-    
-    for invalid in invalid_queries:
-        if query_upper.startswith(invalid):
-            return False
-    
-    return True
+    words = query.lstrip()[:32].split(None, 1)
+    first_keyword = words[0].rstrip(';').upper() if words else ''
+    return first_keyword not in _NOT_EXPLAINABLE
+
+# Tables that only exist in performance_history database
+_HISTORICAL_TABLES_RE = re.compile(
+    r'query_snapshots|index_usage_snapshots|performance_regressions|'
+    r'configuration_snapshots|schema_snapshots',
+    re.IGNORECASE
+)
 
 def references_historical_tables(query: str) -> bool:
     """Check if query references tables that only exist in historical database"""
-    query_lower = query.lower()
-    
-    # Tables that only exist in performance_history database
-    historical_tables = [
-        'query_snapshots',
-        'index_usage_snapshots',
-        'performance_regressions',
-        'configuration_snapshots',
-        'schema_snapshots'
-    ]
-    
-    for table in historical_tables:
-        if table in query_lower:
-            return True
-    
-    return False
+    return _HISTORICAL_TABLES_RE.search(query) is not None
 
 def get_estimated_metrics(query: str, recommended_action: str) -> Tuple[Dict, Dict]:
     """Get estimated metrics when real simulation is not possible"""
@@ -269,7 +522,7 @@ def get_estimated_metrics(query: str, recommended_action: str) -> Tuple[Dict, Di
     
     # Add variation based on query length and complexity
     complexity_factor = 1.0
-    if 'query_snapshots' in query.lower():
+    if 'QUERY_SNAPSHOTS' in query_upper:
         complexity_factor = 1.5  # Historical queries are typically more complex
     if 'COUNT' in query_upper or 'DISTINCT' in query_upper:
         complexity_factor *= 1.3
@@ -295,25 +548,36 @@ def get_estimated_metrics(query: str, recommended_action: str) -> Tuple[Dict, Di
     
     return before_metrics, after_metrics
 
-def estimate_index_improvement(query: str, recommended_action: str, before_metrics: Dict) -> float:
-    """
-    Estimate the improvement percentage based on query characteristics
-    """
-    query_lower = query.lower()
-    recommendation_lower = recommended_action.lower()
-    
+# Keywords that decide the improvement estimate, tagged in a single scan of the query
+_WHERE, _ORDER_BY, _JOIN = 1, 2, 4
+_IMPROVEMENT_KW_RE = re.compile(r'\b(?:(?P<where>where)|(?P<order_by>order\s+by)|(?P<join>join))\b', re.IGNORECASE)
+_IMPROVEMENT_KW_FLAGS = {'where': _WHERE, 'order_by': _ORDER_BY, 'join': _JOIN}
+
+def _improvement_for(flags: int) -> float:
     # Base improvement estimates
-    if 'where' in query_lower and 'order by' in query_lower:
+    if flags & _WHERE and flags & _ORDER_BY:
         return 0.7  # 70% improvement for WHERE + ORDER BY
-    elif 'where' in query_lower:
+    elif flags & _WHERE:
         return 0.5  # 50% improvement for WHERE clause
-    elif 'order by' in query_lower:
+    elif flags & _ORDER_BY:
         return 0.6  # 60% improvement for ORDER BY
-    elif 'join' in query_lower:
+    elif flags & _JOIN:
         return 0.4  # 40% improvement for JOINs
     else:
         return 0.3  # 30% improvement for other cases
 
+# Every keyword combination, precomputed
+_IMPROVEMENT_BY_FLAGS = tuple(_improvement_for(flags) for flags in range(8))
+
+def estimate_index_improvement(query: str, recommended_action: str, before_metrics: Dict) -> float:
+    """
+    Estimate the improvement percentage based on query characteristics
+    """
+    flags = 0
+    for match in _IMPROVEMENT_KW_RE.finditer(query):
+        flags |= _IMPROVEMENT_KW_FLAGS[match.lastgroup]
+    return _IMPROVEMENT_BY_FLAGS[flags]
+
 if __name__ == "__main__":
     # Test the simulation
     test_query = "SELECT * FROM olist_orders_dataset WHERE order_status = 'delivered'"
@@ -1,8 +1,9 @@
 # scripts/load_data.py
 import os
-import csv
 import io
+import pandas as pd
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Connection Parameters (use your environment variables in a real app) ---
 DB_PARAMS = {
@@ -45,66 +46,134 @@ REQUIRED_COLUMNS = {
     ]
 }
 
+# Rows parsed per pandas chunk while streaming a CSV into COPY
+CSV_CHUNK_ROWS = 50_000
+
+class _ChunkedCsvStream(io.TextIOBase):
+    """Read-only file object over CSV text produced one chunk at a time."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = io.StringIO()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._current.read(size)
+        while not data:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return ''
+            self._current = io.StringIO(chunk)
+            data = self._current.read(size)
+        return data
+
 def _prepare_csv_with_required_columns(source_csv_path, required_columns):
-    """Create an in-memory CSV with only the required columns, preserving header.
+    """Stream a CSV with only the required columns, preserving header.
 
     This avoids COPY errors like 'extra data after last expected column'
-    when source CSVs contain additional fields.
+    when source CSVs contain additional fields. Rows are projected in chunks
+    as COPY reads them, so the whole file is never held in memory.
     """
-    with open(source_csv_path, 'r', encoding='utf-8', newline='') as infile:
-        reader = csv.DictReader(infile)
-        if not reader.fieldnames:
-            raise ValueError(f"CSV has no header: {source_csv_path}")
-
-        missing = [c for c in required_columns if c not in reader.fieldnames]
-        if missing:
-            raise ValueError(
-                f"Missing required columns {missing} in {os.path.basename(source_csv_path)}."
-            )
+    try:
+        header = pd.read_csv(source_csv_path, nrows=0, encoding='utf-8').columns
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"CSV has no header: {source_csv_path}")
 
-        buffer = io.StringIO()
-        writer = csv.DictWriter(buffer, fieldnames=required_columns)
-        writer.writeheader()
-        for row in reader:
-            writer.writerow({col: row.get(col, "") for col in required_columns})
+    missing = [c for c in required_columns if c not in header]
+    if missing:
+        raise ValueError(
+            f"Missing required columns {missing} in {os.path.basename(source_csv_path)}."
+        )
 
-        buffer.seek(0)
-        return buffer
+    # pandas' C parser does the projection; everything stays text, exactly as in the file
+    reader = pd.read_csv(source_csv_path, usecols=required_columns, dtype=str,
+                         na_filter=False, encoding='utf-8', chunksize=CSV_CHUNK_ROWS)
+    return _ChunkedCsvStream(
+        df[required_columns].to_csv(index=False, header=(i == 0))
+        for i, df in enumerate(reader)
+    )
 
-def load_data():
-    conn = None
-    try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        cur = conn.cursor()
+def _drop_indexes(cur, table_name):
+    """Drop a table's indexes and return the statements that rebuild them."""
+    cur.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+    """, (table_name,))
+    constraints = cur.fetchall()
 
-        # Get the absolute path to the project's root directory
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cur.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+        AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    """, (table_name,))
+    indexes = cur.fetchall()
+
+    for name, _ in constraints:
+        cur.execute(f'ALTER TABLE {table_name} DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cur.execute(f'DROP INDEX "{name}"')
 
-        for table_name, file_name in TABLES_TO_LOAD:
-            file_path = os.path.join(project_root, 'hack_data', file_name)
-            print(f"Loading data from '{file_name}' into table '{table_name}'...")
+    return ([f'ALTER TABLE {table_name} ADD CONSTRAINT "{name}" {definition}'
+             for name, definition in constraints] +
+            [definition for _, definition in indexes])
+
+def _load_one(table_name, file_path):
+    """Load one CSV into its table on a dedicated connection."""
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn.cursor() as cur:
+            print(f"Loading data from '{os.path.basename(file_path)}' into table '{table_name}'...")
 
             # Prepare a CSV stream restricted to the columns our schema defines
             csv_stream = _prepare_csv_with_required_columns(
                 file_path, REQUIRED_COLUMNS[table_name]
             )
 
+            # Truncating in the loading transaction lets COPY FREEZE write the rows
+            # already frozen, and the indexes are built once after the load
+            # instead of being maintained row by row
+            cur.execute(f"TRUNCATE {table_name}")
+            rebuild_statements = _drop_indexes(cur, table_name)
+
             # Use psycopg2's copy_expert for efficient CSV loading
             sql_command = f"""
             COPY {table_name} ({', '.join(REQUIRED_COLUMNS[table_name])})
-            FROM STDIN WITH (FORMAT CSV, HEADER TRUE)
+            FROM STDIN WITH (FORMAT CSV, HEADER TRUE, FREEZE TRUE)
             """
             cur.copy_expert(sql=sql_command, file=csv_stream)
 
+            for statement in rebuild_statements:
+                cur.execute(statement)
+
         conn.commit()
-        cur.close()
+    finally:
+        conn.close()
+
+def load_data():
+    try:
+        # Get the absolute path to the project's root directory
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        # The tables are independent, so each loads on its own connection in parallel;
+        # copy_expert releases the GIL while the server ingests
+        with ThreadPoolExecutor(max_workers=len(TABLES_TO_LOAD)) as executor:
+            futures = [
+                executor.submit(_load_one, table_name, os.path.join(project_root, 'hack_data', file_name))
+                for table_name, file_name in TABLES_TO_LOAD
+            ]
+            for future in futures:
+                # Re-raises the first failure
+                future.result()
+
         print("\nData loading complete!")
 
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Error: {error}")
-    finally:
-        if conn is not None:
-            conn.close()
 
 if __name__ == '__main__':
     load_data()
\ No newline at end of file
@@ -25,6 +25,8 @@ Requires=db-performance-collection.service
 
 [Timer]
 OnCalendar=*:0/{interval_minutes}
+AccuracySec=1min
+RandomizedDelaySec=30s
 Persistent=true
 
 [Install]
@@ -48,18 +50,10 @@ def create_windows_task(script_path: str, interval_minutes: int = 15) -> str:
     python_path = sys.executable
     task_name = "DatabasePerformanceCollection"
     
-    # Create a batch file
-    batch_content = f"""@echo off
-cd /d "{os.path.dirname(script_path)}"
-{python_path} {os.path.basename(script_path)}
-"""
-    
-    batch_file = os.path.join(os.path.dirname(script_path), "run_collection.bat")
-    with open(batch_file, 'w') as f:
-        f.write(batch_content)
-    
-    # Create schtasks command
-    schtasks_cmd = f"""schtasks /create /tn "{task_name}" /tr "{batch_file}" /sc minute /mo {interval_minutes} /ru SYSTEM"""
+    # Point the task straight at python.exe; collection scripts resolve paths from __file__,
+    # so no cd wrapper (and no extra cmd.exe per run) is needed
+    task_command = f'\\"{python_path}\\" \\"{script_path}\\"'
+    schtasks_cmd = f"""schtasks /create /tn "{task_name}" /tr "{task_command}" /sc minute /mo {interval_minutes} /ru SYSTEM"""
     
     return schtasks_cmd
 
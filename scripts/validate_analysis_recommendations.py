@@ -4,41 +4,99 @@ Validate Analysis Recommendations
 Validates recommendations from the comprehensive analysis pipeline.
 """
 
+import argparse
+import io
 import json
+import orjson
 import sys
 import os
-from typing import Dict, List, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Union
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import importlib.util
-spec = importlib.util.spec_from_file_location("validate_recommendation", "scripts/validate_recommendation.py")
-validate_recommendation_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(validate_recommendation_module)
-ValidationHarness = validate_recommendation_module.ValidationHarness
+from scripts.collect_all_stats import positive_int
+from scripts.hypopg_simulate import extract_index_target_from_sql, run_hypopg_batch
+from scripts.validate_recommendation import ValidationHarness
 
-def load_analysis_results(file_path: str) -> Dict[str, Any]:
-    """Load analysis results from JSON file."""
+try:
+    import ijson
+    USE_IJSON = True
+except ImportError:
+    USE_IJSON = False
+
+# The only parts of an analysis file the validation reads
+_ENGINES = ('postgresql', 'mysql')
+_WANTED_PREFIXES = frozenset(f"{engine}.{key}" for engine in _ENGINES for key in ('recommendations', 'query'))
+
+def _stream_analysis_results(f) -> Dict[str, Any]:
+    """Build {engine: {'recommendations': ..., 'query': ...}} from a JSON stream, skipping everything else."""
+    results = {}
+    builder, target, depth = None, None, 0
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+                if depth == 0:
+                    engine, key = target.split('.')
+                    results[engine][key] = builder.value
+                    builder = None
+        elif prefix == '' and event == 'map_key' and value in _ENGINES:
+            results.setdefault(value, {})
+        elif prefix in _WANTED_PREFIXES:
+            engine, key = prefix.split('.')
+            if event in ('start_map', 'start_array'):
+                builder, target, depth = ijson.ObjectBuilder(), prefix, 1
+                builder.event(event, value)
+            elif event != 'map_key':
+                results[engine][key] = value
+    return results
+
+def _read_analysis_results(f: BinaryIO) -> Dict[str, Any]:
+    """Parse an analysis JSON file opened in binary mode."""
+    if USE_IJSON:
+        # Stream the file so plans and stats that are never read are not materialized
+        return _stream_analysis_results(f)
+    return json.load(f)
+
+def load_analysis_results(file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
+    """Load the recommendations and query of each engine from an analysis JSON file (path or binary file)."""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        if hasattr(file_path, 'read'):
+            return _read_analysis_results(file_path)
+        with open(file_path, 'rb') as f:
+            return _read_analysis_results(f)
     except Exception as e:
         print(f"❌ Error loading analysis results: {e}")
         return {}
 
-def validate_recommendations_from_analysis(analysis_file: str, database_type: str = 'postgresql') -> List[Dict[str, Any]]:
+def validate_recommendations_from_analysis(analysis_file: Union[str, BinaryIO], database_type: str = 'postgresql',
+                                           max_workers: int = 1, analyze: bool = False) -> List[Dict[str, Any]]:
     """
     Validate recommendations from a comprehensive analysis file.
     
     Args:
-        analysis_file: Path to analysis results JSON file
+        analysis_file: Path to analysis results JSON file, or the file opened in binary mode
         database_type: Database type to validate against
+        max_workers: PostgreSQL only - validate over this many connections at once, each
+            applying its recommendations in transactions that are rolled back so the
+            workers never see each other's indexes; HypoPG simulations use as many
+            sessions. Concurrent runs share the server, so timings are noisier than
+            with the default serial run.
+        analyze: Build the recommended indexes for real and time the query with
+            EXPLAIN ANALYZE; by default PostgreSQL CREATE INDEX recommendations are
+            simulated with HypoPG through run_hypopg_batch
         
     Returns:
         List of validation results
     """
-    print(f"🔍 Loading analysis results from: {analysis_file}")
+    print(f"🔍 Loading analysis results from: {getattr(analysis_file, 'name', analysis_file)}")
     analysis_results = load_analysis_results(analysis_file)
     
     if not analysis_results:
@@ -71,37 +129,69 @@ def validate_recommendations_from_analysis(analysis_file: str, database_type: st
     
     print(f"🎯 Found {len(index_recommendations)} index recommendations to validate")
     
-    # Validate each recommendation
-    validation_results = []
-    harness = ValidationHarness(database_type)
+    # Extract query from analysis results
+    query = None
+    if 'postgresql' in analysis_results:
+        query = analysis_results['postgresql'].get('query')
+    elif 'mysql' in analysis_results:
+        query = analysis_results['mysql'].get('query')
+    
+    if not query:
+        print("❌ No query found in analysis results")
+        return []
     
     for i, recommendation in enumerate(index_recommendations, 1):
         print(f"\n{'='*60}")
-        print(f"🧪 Validating Recommendation {i}/{len(index_recommendations)}")
+        print(f"🧪 Recommendation {i}/{len(index_recommendations)}")
         print(f"{'='*60}")
         print(f"Type: {recommendation.get('type', 'UNKNOWN')}")
         print(f"Severity: {recommendation.get('severity', 'UNKNOWN')}")
         print(f"Rationale: {recommendation.get('rationale', 'N/A')}")
         print(f"Action: {recommendation.get('suggested_action', 'N/A')}")
+    
+    actions = [recommendation['suggested_action'] for recommendation in index_recommendations]
+    workers = min(max_workers, len(actions)) if database_type == 'postgresql' else 1
+    results = [None] * len(actions)
+    pending = list(range(len(actions)))
+    
+    # Installing HypoPG once up front also keeps the sessions below from racing on CREATE EXTENSION
+    hypothetical = (not analyze and database_type == 'postgresql'
+                    and ValidationHarness(database_type, hypothetical=True).hypopg_available())
+    if hypothetical:
+        # CREATE INDEX candidates are planned against hypothetical indexes in batched HypoPG sessions
+        creates = [i for i in pending if all(extract_index_target_from_sql(actions[i]))]
+        if creates:
+            simulated = run_hypopg_batch([(query, actions[i]) for i in creates], sessions=workers)
+            summary_harness = ValidationHarness(database_type)
+            for i, (before, after) in zip(creates, simulated):
+                results[i] = summary_harness.simulation_result(query, actions[i], before, after)
+            pending = [i for i in pending if results[i] is None]
+    
+    workers = min(workers, len(pending))
+    if workers > 1:
+        # Time the baseline once, before the workers start competing for the server
+        baseline = ValidationHarness(database_type).measure_baseline(query, iterations=3)
         
-        # Extract query from analysis results
-        query = None
-        if 'postgresql' in analysis_results:
-            query = analysis_results['postgresql'].get('query')
-        elif 'mysql' in analysis_results:
-            query = analysis_results['mysql'].get('query')
-        
-        if not query:
-            print("❌ No query found in analysis results")
-            continue
-        
-        # Validate the recommendation
-        result = harness.validate_recommendation(
-            query,
-            recommendation['suggested_action'],
-            iterations=3
-        )
+        # Deal the recommendations out to the workers, each with its own harness and connection
+        def validate_share(indices):
+            harness = ValidationHarness(database_type, isolated=True, hypothetical=hypothetical)
+            return indices, harness.validate_batch(query, [actions[i] for i in indices],
+                                                   iterations=3, baseline=baseline)
         
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for indices, share_results in executor.map(
+                validate_share, [pending[w::workers] for w in range(workers)]
+            ):
+                for i, result in zip(indices, share_results):
+                    results[i] = result
+    elif pending:
+        # Validate the remaining recommendations over one connection and one baseline
+        harness = ValidationHarness(database_type, hypothetical=hypothetical)
+        for i, result in zip(pending, harness.validate_batch(query, [actions[i] for i in pending], iterations=3)):
+            results[i] = result
+    
+    validation_results = []
+    for recommendation, result in zip(index_recommendations, results):
         # Add recommendation metadata to result
         result['recommendation_metadata'] = {
             'type': recommendation.get('type'),
@@ -116,78 +206,115 @@ def validate_recommendations_from_analysis(analysis_file: str, database_type: st
     
     return validation_results
 
+_REPORT_HEADER = """\
+{rule}
+VALIDATION REPORT
+{rule}
+Total Recommendations Validated: {total}
+
+SUMMARY STATISTICS:
+  Successful Validations: {success}/{total}
+  Excellent Improvements: {EXCELLENT}
+  Good Improvements: {GOOD}
+  Moderate Improvements: {MODERATE}
+  Negative Results: {NEGATIVE}
+
+DETAILED RESULTS:
+"""
+
+_REPORT_RESULT = """
+Recommendation #{i}:
+  Type: {type}
+  Severity: {severity}
+  Rule ID: {rule_id}
+  Success: {status}
+"""
+
+_REPORT_SUCCESS = """\
+  Overall Assessment: {overall}
+  Time Improvement: {time_improvement:.1f}%{estimated}
+  Plan Change: {plan_change}
+  Recommendation: {verdict}
+"""
+
+_REPORT_FAILURE = "  Error: {error}\n"
+
 def generate_validation_report(validation_results: List[Dict[str, Any]]) -> str:
     """Generate a comprehensive validation report."""
     if not validation_results:
         return "❌ No validation results to report"
     
-    report = []
-    report.append("=" * 80)
-    report.append("VALIDATION REPORT")
-    report.append("=" * 80)
-    report.append(f"Total Recommendations Validated: {len(validation_results)}")
-    report.append("")
-    
-    # Summary statistics
-    successful = sum(1 for r in validation_results if r.get('success', False))
-    excellent = sum(1 for r in validation_results if r.get('improvement', {}).get('overall_improvement') == 'EXCELLENT')
-    good = sum(1 for r in validation_results if r.get('improvement', {}).get('overall_improvement') == 'GOOD')
-    moderate = sum(1 for r in validation_results if r.get('improvement', {}).get('overall_improvement') == 'MODERATE')
-    negative = sum(1 for r in validation_results if r.get('improvement', {}).get('overall_improvement') == 'NEGATIVE')
-    
-    report.append("SUMMARY STATISTICS:")
-    report.append(f"  Successful Validations: {successful}/{len(validation_results)}")
-    report.append(f"  Excellent Improvements: {excellent}")
-    report.append(f"  Good Improvements: {good}")
-    report.append(f"  Moderate Improvements: {moderate}")
-    report.append(f"  Negative Results: {negative}")
-    report.append("")
+    # Summary statistics, in one pass over the results
+    counts = Counter()
+    for r in validation_results:
+        counts['success'] += bool(r.get('success', False))
+        counts[r.get('improvement', {}).get('overall_improvement')] += 1
     
-    # Detailed results
-    report.append("DETAILED RESULTS:")
-    report.append("")
+    report = io.StringIO()
+    report.write(_REPORT_HEADER.format_map({
+        'rule': "=" * 80,
+        'total': len(validation_results),
+        'success': counts['success'],
+        'EXCELLENT': counts['EXCELLENT'],
+        'GOOD': counts['GOOD'],
+        'MODERATE': counts['MODERATE'],
+        'NEGATIVE': counts['NEGATIVE']
+    }))
     
+    # Detailed results
     for i, result in enumerate(validation_results, 1):
-        report.append(f"Recommendation #{i}:")
-        report.append(f"  Type: {result.get('recommendation_metadata', {}).get('type', 'UNKNOWN')}")
-        report.append(f"  Severity: {result.get('recommendation_metadata', {}).get('severity', 'UNKNOWN')}")
-        report.append(f"  Rule ID: {result.get('recommendation_metadata', {}).get('rule_id', 'UNKNOWN')}")
-        report.append(f"  Success: {'✅' if result.get('success') else '❌'}")
+        metadata = result.get('recommendation_metadata', {})
+        report.write(_REPORT_RESULT.format_map({
+            'i': i,
+            'type': metadata.get('type', 'UNKNOWN'),
+            'severity': metadata.get('severity', 'UNKNOWN'),
+            'rule_id': metadata.get('rule_id', 'UNKNOWN'),
+            'status': '✅' if result.get('success') else '❌'
+        }))
         
         if result.get('success'):
             improvement = result.get('improvement', {})
-            report.append(f"  Overall Assessment: {improvement.get('overall_improvement', 'UNKNOWN')}")
-            report.append(f"  Time Improvement: {improvement.get('execution_time_percent_improvement', 0):.1f}%")
-            report.append(f"  Plan Change: {improvement.get('plan_change', 'N/A')}")
-            
-            # Recommendation
-            overall = improvement.get('overall_improvement', '')
-            if overall in ['EXCELLENT', 'GOOD', 'MODERATE']:
-                report.append(f"  Recommendation: ✅ KEEP")
-            else:
-                report.append(f"  Recommendation: ❌ REJECT")
+            report.write(_REPORT_SUCCESS.format_map({
+                'overall': improvement.get('overall_improvement', 'UNKNOWN'),
+                'time_improvement': improvement.get('execution_time_percent_improvement', 0),
+                'estimated': ' (estimated from HypoPG plan cost)' if result.get('hypothetical') else '',
+                'plan_change': improvement.get('plan_change', 'N/A'),
+                'verdict': '✅ KEEP' if improvement.get('overall_improvement', '') in ['EXCELLENT', 'GOOD', 'MODERATE'] else '❌ REJECT'
+            }))
         else:
-            report.append(f"  Error: {result.get('error', 'Unknown error')}")
-        
-        report.append("")
+            report.write(_REPORT_FAILURE.format_map({'error': result.get('error', 'Unknown error')}))
     
-    return "\n".join(report)
+    return report.getvalue()
 
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Validate recommendations from the comprehensive analysis")
+    parser.add_argument('--analysis-file', default='artifacts/comprehensive_analysis.json',
+                        help='Analysis results JSON file')
+    parser.add_argument('--workers', type=positive_int, default=1,
+                        help='PostgreSQL connections to validate over at once (default 1, serial)')
+    parser.add_argument('--analyze', action='store_true',
+                        help='Build recommended indexes for real and time with EXPLAIN ANALYZE instead of HypoPG')
+    args = parser.parse_args()
+    
     print("🔧 Recommendation Validation Tool")
     print("=" * 50)
     
     # Check for analysis file
-    analysis_file = "artifacts/comprehensive_analysis.json"
-    if not os.path.exists(analysis_file):
+    analysis_file = args.analysis_file
+    try:
+        # Open it straight away rather than checking first, so it is only looked up once
+        analysis = open(analysis_file, 'rb')
+    except FileNotFoundError:
         print(f"❌ Analysis file not found: {analysis_file}")
         print("Run the comprehensive analysis first:")
         print("  python src/analysis/comprehensive_analysis.py")
         return
     
     # Validate recommendations
-    validation_results = validate_recommendations_from_analysis(analysis_file, 'postgresql')
+    with analysis:
+        validation_results = validate_recommendations_from_analysis(analysis, 'postgresql',
+                                                                   max_workers=args.workers, analyze=args.analyze)
     
     if not validation_results:
         print("❌ No validation results generated")
@@ -199,15 +326,14 @@ def main():
     
     # Save results
     output_file = "artifacts/validation_report.json"
-    with open(output_file, 'w') as f:
-        json.dump(validation_results, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(validation_results, default=str, option=orjson.OPT_INDENT_2))
     
     print(f"\n💾 Validation results saved to: {output_file}")
     
     # Save text report
     report_file = "artifacts/validation_report.txt"
-    with open(report_file, 'w', encoding='utf-8') as f:
-        f.write(report)
+    Path(report_file).write_bytes(report.encode('utf-8'))
     
     print(f"📄 Text report saved to: {report_file}")
 
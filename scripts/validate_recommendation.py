@@ -11,7 +11,7 @@ import time
 import re
 import sys
 import os
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 # Add project root to path for imports
@@ -24,17 +24,31 @@ db_config = get_database_config()
 POSTGRES_CONN_STR = db_config.get_postgres_connection_string()
 MYSQL_CONFIG = db_config.get_mysql_config()
 
+# Anchored statement-prefix patterns; only the head of each statement is scanned
+_CREATE_INDEX_RE = re.compile(r'^\s*CREATE\s+INDEX\s+(?!ON\b)(\w+)', re.IGNORECASE)
+_CREATE_TABLE_RE = re.compile(r'^\s*CREATE\s+TABLE\s+(\w+)', re.IGNORECASE)
+_DROP_INDEX_RE = re.compile(r'^\s*DROP\s+INDEX\b', re.IGNORECASE)
+_ALTER_TABLE_RE = re.compile(r'^\s*ALTER\s+TABLE\b', re.IGNORECASE)
+
 class ValidationHarness:
     """Validates database performance recommendations by testing them in a controlled environment."""
     
-    def __init__(self, database_type: str = 'postgresql'):
+    def __init__(self, database_type: str = 'postgresql', isolated: bool = False,
+                 hypothetical: bool = False):
         """
         Initialize the validation harness.
         
         Args:
             database_type: 'postgresql' or 'mysql'
+            isolated: PostgreSQL only - apply each recommendation in a transaction that is
+                rolled back, so other sessions never see it
+            hypothetical: PostgreSQL only - simulate CREATE INDEX recommendations with HypoPG
+                instead of building them; the after timing is then estimated from plan costs
         """
         self.database_type = database_type.lower()
+        self.isolated = isolated and self.database_type == 'postgresql'
+        self.hypothetical = hypothetical and self.database_type == 'postgresql'
+        self.hypothetical_applied = False  # HypoPG indexes are session state, not transactional
         self.connection = None
         self.applied_changes = []  # Track changes for cleanup
         
@@ -43,7 +57,9 @@ class ValidationHarness:
         try:
             if self.database_type == 'postgresql':
                 self.connection = psycopg2.connect(POSTGRES_CONN_STR)
-                self.connection.autocommit = True
+                self.connection.autocommit = not self.isolated
+                if self.hypothetical:
+                    self._enable_hypopg()
             elif self.database_type == 'mysql':
                 self.connection = mysql.connector.connect(**MYSQL_CONFIG)
             else:
@@ -53,29 +69,50 @@ class ValidationHarness:
             print(f"❌ Failed to connect to {self.database_type.upper()}: {e}")
             raise
     
+    def _enable_hypopg(self):
+        """Make sure HypoPG is installed, falling back to real index builds when it is not."""
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+            if not self.connection.autocommit:
+                self.connection.commit()
+        except Exception as e:
+            print(f"⚠️  HypoPG not available, building real indexes instead: {e}")
+            if not self.connection.autocommit:
+                self.connection.rollback()
+            self.hypothetical = False
+    
+    def hypopg_available(self) -> bool:
+        """Install HypoPG if needed and report whether hypothetical indexes can be used."""
+        self.connect()
+        self.disconnect()
+        return self.hypothetical
+    
     def disconnect(self):
         """Close database connection."""
         if self.connection:
             self.connection.close()
             print(f"✅ Disconnected from {self.database_type.upper()}")
     
-    def get_performance_metrics(self, cursor, query: str) -> Dict[str, Any]:
+    def get_performance_metrics(self, cursor, query: str, analyze: bool = True) -> Dict[str, Any]:
         """
         Runs EXPLAIN ANALYZE and returns key performance metrics.
         
         Args:
             cursor: Database cursor
             query: SQL query to analyze
+            analyze: PostgreSQL only - set to False to plan the query without running it
+                (the only way HypoPG indexes are seen); execution_time_ms is then 0
             
         Returns:
             Dictionary with performance metrics
         """
         try:
             if self.database_type == 'postgresql':
-                cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")
+                cursor.execute(f"EXPLAIN ({'ANALYZE, ' if analyze else ''}FORMAT JSON) {query}")
                 result = cursor.fetchone()[0][0]
                 plan = result['Plan']
-                execution_time = result['Execution Time']
+                execution_time = result.get('Execution Time', 0)
                 
                 return {
                     "node_type": plan['Node Type'],
@@ -132,11 +169,16 @@ class ValidationHarness:
         try:
             print(f"🔧 Applying: {recommendation}")
             
+            if self.hypothetical and _CREATE_INDEX_RE.match(recommendation):
+                cursor.execute("SELECT indexrelid FROM hypopg_create_index(%s)", (recommendation,))
+                self.hypothetical_applied = True
+                print("✅ Hypothetical index created")
+                return True
+            
             # Check if index already exists and drop it first
-            if recommendation.upper().strip().startswith('CREATE INDEX'):
-                index_name = self._extract_index_name(recommendation)
-                if index_name:
-                    self._drop_index_if_exists(cursor, index_name)
+            index_name = self._extract_index_name(recommendation)
+            if index_name:
+                self._drop_index_if_exists(cursor, index_name)
             
             cursor.execute(recommendation)
             
@@ -150,7 +192,7 @@ class ValidationHarness:
     
     def _extract_index_name(self, recommendation: str) -> str:
         """Extract index name from CREATE INDEX statement."""
-        match = re.search(r'CREATE\s+INDEX\s+(\w+)', recommendation.upper())
+        match = _CREATE_INDEX_RE.match(recommendation)
         return match.group(1) if match else None
     
     def _drop_index_if_exists(self, cursor, index_name: str):
@@ -175,6 +217,18 @@ class ValidationHarness:
         Returns:
             True if successful, False otherwise
         """
+        if self.hypothetical_applied:
+            print("🧹 Cleaning up: SELECT hypopg_reset()")
+            cursor.execute("SELECT hypopg_reset()")
+            self.hypothetical_applied = False
+        
+        if self.isolated:
+            # Nothing was committed; rolling back drops every applied change at once
+            self.connection.rollback()
+            print("✅ Rolled back applied changes")
+            self.applied_changes.clear()
+            return True
+        
         success = True
         for change in reversed(self.applied_changes):  # Reverse order for proper cleanup
             try:
@@ -200,33 +254,27 @@ class ValidationHarness:
         Returns:
             Cleanup command or None if not applicable
         """
-        original_upper = original_command.upper().strip()
-        
-        if original_upper.startswith('CREATE INDEX'):
-            # Extract index name
-            match = re.search(r'CREATE\s+INDEX\s+(\w+)', original_upper)
-            if match:
-                index_name = match.group(1)
-                if self.database_type == 'mysql':
-                    return f"DROP INDEX {index_name} ON orders;"
-                else:
-                    return f"DROP INDEX IF EXISTS {index_name};"
-        
-        elif original_upper.startswith('DROP INDEX'):
+        match = _CREATE_INDEX_RE.match(original_command)
+        if match:
+            index_name = match.group(1)
+            if self.database_type == 'mysql':
+                return f"DROP INDEX {index_name} ON orders;"
+            else:
+                return f"DROP INDEX IF EXISTS {index_name};"
+        
+        if _DROP_INDEX_RE.match(original_command):
             # For DROP INDEX commands, we need to recreate the index
             # This is a simplified approach - in practice, you'd need to store the original CREATE statement
-            if 'orders_pkey' in original_upper:
+            if 'orders_pkey' in original_command.lower():
                 return "CREATE INDEX orders_pkey ON orders (id);"  # Recreate primary key
             return None
         
-        elif original_upper.startswith('CREATE TABLE'):
-            # Extract table name
-            match = re.search(r'CREATE\s+TABLE\s+(\w+)', original_upper)
-            if match:
-                table_name = match.group(1)
-                return f"DROP TABLE IF EXISTS {table_name};"
+        match = _CREATE_TABLE_RE.match(original_command)
+        if match:
+            table_name = match.group(1)
+            return f"DROP TABLE IF EXISTS {table_name};"
         
-        elif original_upper.startswith('ALTER TABLE'):
+        if _ALTER_TABLE_RE.match(original_command):
             # For ALTER TABLE, we might need more complex cleanup
             # For now, just log that manual cleanup might be needed
             print(f"⚠️  Manual cleanup may be required for: {original_command}")
@@ -246,11 +294,60 @@ class ValidationHarness:
         Returns:
             Validation results dictionary
         """
+        return self.validate_batch(query, [recommendation], iterations)[0]
+    
+    def measure_baseline(self, query: str, iterations: int = 3) -> Dict[str, Any]:
+        """
+        Measure the query before any recommendation is applied.
+        
+        Args:
+            query: SQL query to test
+            iterations: Number of iterations to run for more accurate results
+            
+        Returns:
+            {'metrics': per-iteration metrics, 'average': averaged metrics}, to pass
+            to validate_batch for every batch of the same query
+        """
+        self.connect()
+        try:
+            with self.connection.cursor() as cur:
+                return self._measure_baseline(cur, query, iterations)
+        finally:
+            self.disconnect()
+    
+    def _measure_baseline(self, cursor, query: str, iterations: int) -> Dict[str, Any]:
+        """Measure and average the baseline on an open cursor."""
+        print(f"\n📊 [BASELINE] Measuring performance before applying recommendations...")
+        before_metrics = self._measure_iterations(cursor, query, iterations)
+        
+        # Calculate average baseline metrics
+        avg_before = self._calculate_average_metrics(before_metrics)
+        print(f"  ✅ Baseline: {avg_before['node_type']} - {avg_before['execution_time_ms']:.2f}ms avg")
+        return {'metrics': before_metrics, 'average': avg_before}
+    
+    def validate_batch(self, query: str, recommendations: List[str], iterations: int = 3,
+                       baseline: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Validate several recommendations for one query over a single connection.
+        
+        The baseline is measured once; each recommendation is then applied, measured
+        and cleaned up before the next one, so they never see each other's changes.
+        
+        Args:
+            query: SQL query to test
+            recommendations: Recommendations to validate
+            iterations: Number of iterations to run for more accurate results
+            baseline: Result of measure_baseline() for query, to skip measuring it again
+            
+        Returns:
+            Validation results dictionaries, in the order of recommendations
+        """
         print(f"\n{'='*60}")
-        print(f"🔍 VALIDATING RECOMMENDATION")
+        print(f"🔍 VALIDATING {len(recommendations)} RECOMMENDATION(S)")
         print(f"{'='*60}")
         print(f"Query: {query}")
-        print(f"Recommendation: {recommendation}")
+        for recommendation in recommendations:
+            print(f"Recommendation: {recommendation}")
         print(f"Database: {self.database_type.upper()}")
         print(f"Iterations: {iterations}")
         print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -260,76 +357,111 @@ class ValidationHarness:
         try:
             with self.connection.cursor() as cur:
                 # 1. Baseline: Measure performance before changes
-                print(f"\n📊 [BASELINE] Measuring performance before applying recommendation...")
-                before_metrics = []
-                
-                for i in range(iterations):
-                    print(f"  Iteration {i+1}/{iterations}...")
-                    metrics = self.get_performance_metrics(cur, query)
-                    before_metrics.append(metrics)
-                    time.sleep(0.1)  # Small delay between iterations
-                
-                # Calculate average baseline metrics
-                avg_before = self._calculate_average_metrics(before_metrics)
-                print(f"  ✅ Baseline: {avg_before['node_type']} - {avg_before['execution_time_ms']:.2f}ms avg")
+                if baseline is None:
+                    baseline = self._measure_baseline(cur, query, iterations)
+                before_metrics, avg_before = baseline['metrics'], baseline['average']
                 
-                # 2. Apply recommendation
-                print(f"\n🔧 [APPLY] Applying recommendation...")
-                if not self.apply_recommendation(cur, recommendation):
-                    return {
-                        "success": False,
-                        "error": "Failed to apply recommendation",
-                        "baseline_metrics": avg_before
-                    }
+                results = []
+                for i, recommendation in enumerate(recommendations, 1):
+                    print(f"\n🧪 Recommendation {i}/{len(recommendations)}: {recommendation}")
+                    try:
+                        results.append(self._validate_against_baseline(
+                            cur, query, recommendation, iterations, before_metrics, avg_before
+                        ))
+                    finally:
+                        # 7. Cleanup before the next recommendation is applied
+                        print(f"\n🧹 [CLEANUP] Cleaning up applied changes...")
+                        try:
+                            self.cleanup_changes(cur)
+                        except Exception as e:
+                            print(f"❌ Cleanup failed: {e}")
                 
-                # 3. After: Measure performance after changes
-                print(f"\n📊 [AFTER] Measuring performance after applying recommendation...")
-                after_metrics = []
-                
-                for i in range(iterations):
-                    print(f"  Iteration {i+1}/{iterations}...")
-                    metrics = self.get_performance_metrics(cur, query)
-                    after_metrics.append(metrics)
-                    time.sleep(0.1)
-                
-                # Calculate average after metrics
-                avg_after = self._calculate_average_metrics(after_metrics)
-                print(f"  ✅ After: {avg_after['node_type']} - {avg_after['execution_time_ms']:.2f}ms avg")
-                
-                # 4. Calculate improvements
-                improvement = self._calculate_improvement(avg_before, avg_after)
-                
-                # 5. Generate validation report
-                validation_result = {
-                    "success": True,
-                    "query": query,
-                    "recommendation": recommendation,
-                    "database_type": self.database_type,
-                    "iterations": iterations,
-                    "baseline_metrics": avg_before,
-                    "after_metrics": avg_after,
-                    "improvement": improvement,
-                    "all_baseline_metrics": before_metrics,
-                    "all_after_metrics": after_metrics,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                # 6. Display results
-                self._display_validation_results(validation_result)
-                
-                return validation_result
+                return results
                 
         finally:
-            # 7. Cleanup
-            print(f"\n🧹 [CLEANUP] Cleaning up applied changes...")
-            try:
-                with self.connection.cursor() as cur:
-                    self.cleanup_changes(cur)
-            except Exception as e:
-                print(f"❌ Cleanup failed: {e}")
-            
             self.disconnect()
     
+    def _measure_iterations(self, cursor, query: str, iterations: int) -> List[Dict[str, Any]]:
+        """Collect performance metrics for query over several iterations."""
+        metrics = []
+        for i in range(iterations):
+            print(f"  Iteration {i+1}/{iterations}...")
+            metrics.append(self.get_performance_metrics(cursor, query))
+            time.sleep(0.1)  # Small delay between iterations
+        return metrics
+    
+    def _validate_against_baseline(self, cursor, query: str, recommendation: str, iterations: int,
+                                   before_metrics: List[Dict[str, Any]], avg_before: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one recommendation and compare the query against an already measured baseline."""
+        # 2. Apply recommendation
+        print(f"\n🔧 [APPLY] Applying recommendation...")
+        if not self.apply_recommendation(cursor, recommendation):
+            return {
+                "success": False,
+                "error": "Failed to apply recommendation",
+                "baseline_metrics": avg_before
+            }
+        
+        # 3. After: Measure performance after changes
+        print(f"\n📊 [AFTER] Measuring performance after applying recommendation...")
+        hypothetical = self.hypothetical_applied
+        if hypothetical:
+            # HypoPG indexes are invisible to ANALYZE; plan once and scale the baseline by cost
+            metrics = self.get_performance_metrics(cursor, query, analyze=False)
+            if metrics.get('total_cost') and avg_before.get('total_cost'):
+                metrics['execution_time_ms'] = avg_before['execution_time_ms'] * metrics['total_cost'] / avg_before['total_cost']
+            after_metrics = [metrics]
+        else:
+            after_metrics = self._measure_iterations(cursor, query, iterations)
+        
+        # Calculate average after metrics
+        avg_after = self._calculate_average_metrics(after_metrics)
+        print(f"  ✅ After: {avg_after['node_type']} - {avg_after['execution_time_ms']:.2f}ms {'estimated' if hypothetical else 'avg'}")
+        
+        # 4. Calculate improvements
+        improvement = self._calculate_improvement(avg_before, avg_after)
+        
+        # 5. Generate validation report
+        validation_result = {
+            "success": True,
+            "query": query,
+            "recommendation": recommendation,
+            "database_type": self.database_type,
+            "iterations": iterations,
+            "hypothetical": hypothetical,
+            "baseline_metrics": avg_before,
+            "after_metrics": avg_after,
+            "improvement": improvement,
+            "all_baseline_metrics": before_metrics,
+            "all_after_metrics": after_metrics,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        # 6. Display results
+        self._display_validation_results(validation_result)
+        
+        return validation_result
+    
+    def simulation_result(self, query: str, recommendation: str,
+                          before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the validation result for a HypoPG simulation, e.g. one pair from run_hypopg_batch."""
+        validation_result = {
+            "success": True,
+            "query": query,
+            "recommendation": recommendation,
+            "database_type": self.database_type,
+            "iterations": 1,
+            "hypothetical": True,
+            "baseline_metrics": before,
+            "after_metrics": after,
+            "improvement": self._calculate_improvement(before, after),
+            "all_baseline_metrics": [before],
+            "all_after_metrics": [after],
+            "timestamp": datetime.now().isoformat()
+        }
+        self._display_validation_results(validation_result)
+        return validation_result
+    
     def _calculate_average_metrics(self, metrics_list: list) -> Dict[str, Any]:
         """Calculate average metrics from multiple measurements."""
         if not metrics_list:
@@ -425,7 +557,8 @@ class ValidationHarness:
         print(f"")
         print(f"📊 Performance Metrics:")
         print(f"  Before: {baseline.get('node_type', 'N/A')} - {baseline.get('execution_time_ms', 0):.2f}ms")
-        print(f"  After:  {after.get('node_type', 'N/A')} - {after.get('execution_time_ms', 0):.2f}ms")
+        estimated = " (estimated from HypoPG plan cost)" if result.get('hypothetical') else ""
+        print(f"  After:  {after.get('node_type', 'N/A')} - {after.get('execution_time_ms', 0):.2f}ms{estimated}")
         print(f"")
         print(f"📈 Improvements:")
         if 'execution_time_delta_ms' in improvement:
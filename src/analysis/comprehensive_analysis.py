@@ -17,22 +17,16 @@ from src.parsers.postgres_plan import parse_postgres_plan
 from src.parsers.mysql_plan import parse_mysql_plan
 from src.analysis.rules_engine import run_all_rules
 from src.analysis.scoring import calculate_scores
+from scripts.find_unused_indexes import find_postgres_unused_indexes, find_mysql_unused_indexes
 
-# Import unused index functions directly
-import importlib.util
-spec = importlib.util.spec_from_file_location("find_unused_indexes", "scripts/find_unused_indexes.py")
-find_unused_indexes_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(find_unused_indexes_module)
-find_postgres_unused_indexes = find_unused_indexes_module.find_postgres_unused_indexes
-find_mysql_unused_indexes = find_unused_indexes_module.find_mysql_unused_indexes
-
-def analyze_postgres_query_with_unused_indexes(sql_query: str, plan_file: str = None) -> dict:
+def analyze_postgres_query_with_unused_indexes(sql_query: str, plan_file: str = None, _shared: dict = None) -> dict:
     """
     Analyze a PostgreSQL query including unused index detection.
     
     Args:
         sql_query: The SQL query to analyze
         plan_file: Optional path to existing plan file
+        _shared: Optional bundle of pre-computed sub-results shared across engines
         
     Returns:
         Analysis results dictionary
@@ -44,7 +38,7 @@ def analyze_postgres_query_with_unused_indexes(sql_query: str, plan_file: str =
     # 1. Extract SQL features
     print("1. Extracting SQL features...")
     try:
-        sql_features = extract_sql_features(sql_query)
+        sql_features = (_shared or {}).get('sql_features') or extract_sql_features(sql_query)
         print(f"   WHERE columns: {sql_features.get('where_columns', [])}")
     except Exception as e:
         print(f"   Error extracting SQL features: {e}")
@@ -75,7 +69,9 @@ def analyze_postgres_query_with_unused_indexes(sql_query: str, plan_file: str =
     
     # 3. Find unused indexes
     print("3. Analyzing unused indexes...")
-    unused_indexes = find_postgres_unused_indexes()
+    unused_indexes = (_shared or {}).get('postgres_unused_indexes')
+    if unused_indexes is None:
+        unused_indexes = find_postgres_unused_indexes()
     print(f"   Found {len(unused_indexes)} unused indexes")
     print()
     
@@ -115,12 +111,13 @@ def analyze_postgres_query_with_unused_indexes(sql_query: str, plan_file: str =
     }
     return results
 
-def analyze_mysql_query_with_unused_indexes(sql_query: str) -> dict:
+def analyze_mysql_query_with_unused_indexes(sql_query: str, _shared: dict = None) -> dict:
     """
     Analyze a MySQL query including unused index detection.
     
     Args:
         sql_query: The SQL query to analyze
+        _shared: Optional bundle of pre-computed sub-results shared across engines
         
     Returns:
         Analysis results dictionary
@@ -132,7 +129,7 @@ def analyze_mysql_query_with_unused_indexes(sql_query: str) -> dict:
     # 1. Extract SQL features
     print("1. Extracting SQL features...")
     try:
-        sql_features = extract_sql_features(sql_query)
+        sql_features = (_shared or {}).get('sql_features') or extract_sql_features(sql_query)
         print(f"   WHERE columns: {sql_features.get('where_columns', [])}")
     except Exception as e:
         print(f"   Error extracting SQL features: {e}")
@@ -158,7 +155,9 @@ def analyze_mysql_query_with_unused_indexes(sql_query: str) -> dict:
     
     # 3. Find unused indexes
     print("3. Analyzing unused indexes...")
-    unused_indexes = find_mysql_unused_indexes()
+    unused_indexes = (_shared or {}).get('mysql_unused_indexes')
+    if unused_indexes is None:
+        unused_indexes = find_mysql_unused_indexes()
     print(f"   Found {len(unused_indexes)} unused indexes")
     print()
     
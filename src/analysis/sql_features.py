@@ -1,8 +1,35 @@
 # src/analysis/sql_features.py
+import re
+from functools import lru_cache
 from sqlglot import parse_one, exp
 from sqlglot.errors import ParseError
 from typing import Dict, List, Optional
 
+# Quoted strings and identifiers, dollar-quoted bodies and comments are kept verbatim (an
+# unterminated one runs to the end); whitespace between them is collapsed to one space
+_VERBATIM_OR_SPACE_RE = re.compile(r"""
+    (?P<keep>
+        '(?:[^']|'')*'?
+      | "(?:[^"]|"")*"?
+      | `[^`]*`?
+      | \$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z)
+      | --[^\n]*\n?
+      | /\*.*?(?:\*/|\Z)
+    )
+    | \s+
+""", re.VERBOSE | re.DOTALL)
+
+def normalize_whitespace(sql_query: str) -> str:
+    """Collapse whitespace outside quoted literals, keeping case and the literals themselves.
+    
+    Queries with backslashes are only stripped: whether a backslash escapes a quote depends
+    on the server's settings, so the literal boundaries cannot be told for sure.
+    """
+    sql_query = sql_query.strip()
+    if '\\' in sql_query:
+        return sql_query
+    return _VERBATIM_OR_SPACE_RE.sub(lambda m: m.group('keep') or ' ', sql_query)
+
 def extract_sql_features(sql_query: str) -> Dict[str, any]:
     """
     Parses a SQL query and extracts features like columns from the WHERE clause.
@@ -19,6 +46,26 @@ def extract_sql_features(sql_query: str) -> Dict[str, any]:
     if not sql_query or not sql_query.strip():
         raise ValueError("SQL query cannot be empty")
     
+    # Parsing is memoized per query string; hand out a copy so callers can't mutate the cached entry
+    features = _parse_sql_features(sql_query)
+    features = dict(features, where_columns=list(features['where_columns']))
+    
+    # Reported on every call, outside the memoized parse, so cache hits print too
+    print(f"--- SQL Feature Extraction ---")
+    print(f"Original Query: {sql_query}")
+    print(f"Query Type: {features['query_type']}")
+    print(f"Table Name: {features['table_name']}")
+    print(f"WHERE Columns: {features['where_columns']}")
+    print(f"Has WHERE: {features['has_where_clause']}")
+    print(f"Has ORDER BY: {features['has_order_by']}")
+    print(f"Has GROUP BY: {features['has_group_by']}")
+    print(f"Has JOINs: {features['has_joins']}")
+    
+    return features
+
+@lru_cache(maxsize=128)
+def _parse_sql_features(sql_query: str) -> Dict[str, any]:
+    """Parse a SQL query once and extract its features."""
     try:
         # Parse the SQL query
         parsed = parse_one(sql_query.strip())
@@ -72,16 +119,6 @@ def extract_sql_features(sql_query: str) -> Dict[str, any]:
         if parsed.find(exp.Join):
             features['has_joins'] = True
         
-        print(f"--- SQL Feature Extraction ---")
-        print(f"Original Query: {sql_query}")
-        print(f"Query Type: {features['query_type']}")
-        print(f"Table Name: {features['table_name']}")
-        print(f"WHERE Columns: {features['where_columns']}")
-        print(f"Has WHERE: {features['has_where_clause']}")
-        print(f"Has ORDER BY: {features['has_order_by']}")
-        print(f"Has GROUP BY: {features['has_group_by']}")
-        print(f"Has JOINs: {features['has_joins']}")
-        
         return features
         
     except ParseError as e:
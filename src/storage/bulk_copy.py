@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Bulk Copy Helpers
+Streams rows into PostgreSQL tables with COPY FROM STDIN instead of INSERTs.
+"""
+
+import io
+from typing import Any, Dict, Iterable, Sequence
+
+def _csv_field(value: Any) -> str:
+    """Render one CSV field; COPY reads only an unquoted empty field as NULL, so every value is quoted."""
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Dict[str, Any]],
+              keys: Sequence[str] = None) -> int:
+    """
+    COPY dict rows into table through an in-memory CSV buffer.
+
+    Args:
+        cur: psycopg2 cursor on the target database
+        table: Destination table name
+        columns: Table columns to fill; omitted columns get their DEFAULT
+        rows: Row dicts to copy
+        keys: Dict keys matching columns, when they differ from the column names
+
+    Returns:
+        Number of rows copied
+    """
+    keys = keys or columns
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write(','.join([_csv_field(row.get(key)) for key in keys]))
+        buffer.write('\n')
+        count += 1
+
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return count
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the COPY FROM STDIN helper, run against an in-memory cursor stub
+"""
+
+import csv
+import io
+
+from src.storage.bulk_copy import copy_rows
+
+class _CopyCursor:
+    """Cursor stub that keeps what copy_expert() was given."""
+
+    def __init__(self):
+        self.sql = None
+        self.data = None
+
+    def copy_expert(self, sql, buffer):
+        self.sql = sql
+        self.data = buffer.read()
+
+def _copy(rows, **kwargs):
+    cur = _CopyCursor()
+    count = copy_rows(cur, 'slow_log_summary', ('database_name', 'query_sample', 'calls'), rows, **kwargs)
+    return cur, count
+
+def test_copy_statement_names_table_and_columns():
+    cur, count = _copy([{'database_name': 'test', 'query_sample': 'SELECT 1', 'calls': 3}])
+    assert count == 1
+    assert cur.sql == "COPY slow_log_summary (database_name, query_sample, calls) FROM STDIN WITH (FORMAT csv)"
+    assert cur.data == '"test","SELECT 1","3"\n'
+
+def test_only_missing_values_are_null():
+    # COPY (FORMAT csv) reads an unquoted empty field as NULL and anything quoted as a value
+    cur, _ = _copy([{'database_name': 'test', 'query_sample': None}])
+    assert cur.data == '"test",,\n'
+
+def test_strings_that_look_like_null_stay_values():
+    cur, _ = _copy([{'database_name': r'\N', 'query_sample': '', 'calls': 0}])
+    assert cur.data == '"\\N","","0"\n'
+
+def test_quotes_and_newlines_round_trip():
+    sample = 'SELECT "a", \'b\'\nFROM t'
+    cur, _ = _copy([{'database_name': 'test', 'query_sample': sample, 'calls': 1}])
+    assert next(csv.reader(io.StringIO(cur.data))) == ['test', sample, '1']
+
+def test_keys_map_dict_keys_to_columns():
+    cur, count = _copy([{'db': 'a', 'sample': 'x', 'n': 1}, {'db': 'b', 'sample': 'y', 'n': 2}],
+                       keys=('db', 'sample', 'n'))
+    assert count == 2
+    assert cur.data == '"a","x","1"\n"b","y","2"\n'
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the query normalization behind the web application's response and analysis caches
+"""
+
+from app import app, _request_cache_key
+from src.analysis.sql_features import normalize_whitespace
+
+def _key(path='/api/query-analysis', **kwargs):
+    with app.test_request_context(path, method='POST', **kwargs):
+        return _request_cache_key()
+
+def test_whitespace_between_tokens_is_collapsed():
+    assert normalize_whitespace("  SELECT *\n\tFROM orders   WHERE id = 1 ") == "SELECT * FROM orders WHERE id = 1"
+
+def test_quoted_literals_and_identifiers_are_kept():
+    assert normalize_whitespace("SELECT  \"Col  A\"  FROM t WHERE a = 'x  y'") == "SELECT \"Col  A\" FROM t WHERE a = 'x  y'"
+    assert normalize_whitespace("SELECT 'it''s  here'") == "SELECT 'it''s  here'"
+    assert normalize_whitespace("SELECT $q$a   b$q$,   1") == "SELECT $q$a   b$q$, 1"
+
+def test_comments_keep_their_line_break():
+    assert normalize_whitespace("SELECT 1 -- note\n   FROM t") == "SELECT 1 -- note\n FROM t"
+
+def test_case_is_kept():
+    assert normalize_whitespace("SELECT * FROM t WHERE a = 'X'") != normalize_whitespace("select * from t where a = 'x'")
+
+def test_backslashes_disable_normalization():
+    assert normalize_whitespace(" SELECT  'a\\'  b' ") == "SELECT  'a\\'  b'"
+
+def test_request_key_ignores_whitespace_outside_literals():
+    assert _key(json={'query': 'SELECT *  FROM t\nWHERE a = 1'}) == _key(json={'query': 'SELECT * FROM t WHERE a = 1'})
+
+def test_request_key_separates_literals_case_and_paths():
+    base = _key(json={'query': "SELECT * FROM t WHERE a = 'a b'"})
+    assert base != _key(json={'query': "SELECT * FROM t WHERE a = 'a  b'"})
+    assert base != _key(json={'query': "SELECT * FROM t WHERE a = 'A b'"})
+    assert base != _key('/api/simulate', json={'query': "SELECT * FROM t WHERE a = 'a b'"})
+
+def test_request_key_ignores_query_string_order():
+    assert _key('/api/regressions?hours=24&limit=5') == _key('/api/regressions?limit=5&hours=24')
+    assert _key('/api/regressions?hours=24') != _key('/api/regressions?hours=12')
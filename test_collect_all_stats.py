@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the collection daemon's schedule and its --interval argument
+"""
+
+import argparse
+
+import pytest
+
+import scripts.collect_all_stats as collect_all
+
+class _StopDaemon(Exception):
+    pass
+
+def _run_schedule(monkeypatch, run_durations, interval_minutes=1):
+    """Run collect_forever on a fake clock; return the times each collection started."""
+    clock = [1000.0]
+    starts = []
+    durations = iter(run_durations)
+
+    def collect_once(args):
+        starts.append(clock[0] - 1000.0)
+        clock[0] += next(durations)
+
+    def sleep(seconds):
+        if len(starts) == len(run_durations):
+            raise _StopDaemon
+        clock[0] += seconds
+
+    monkeypatch.setattr(collect_all, 'collect_once', collect_once)
+    monkeypatch.setattr(collect_all.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(collect_all.time, 'sleep', sleep)
+    with pytest.raises(_StopDaemon):
+        collect_all.collect_forever(None, interval_minutes)
+    return starts
+
+def test_runs_stay_on_the_schedule_of_the_first_run(monkeypatch):
+    # Slow runs do not push later runs back
+    assert _run_schedule(monkeypatch, [5, 20, 59, 1]) == [0, 60, 120, 180]
+
+def test_ticks_missed_by_an_overrun_are_skipped(monkeypatch):
+    # A 150s run misses the 60s and 120s ticks; the next run waits for 180s
+    assert _run_schedule(monkeypatch, [150, 1, 1]) == [0, 180, 240]
+
+def test_run_ending_exactly_on_a_tick_starts_the_next_one_at_once(monkeypatch):
+    assert _run_schedule(monkeypatch, [60, 1]) == [0, 60]
+
+@pytest.mark.parametrize("value", ["1", "15", "1440"])
+def test_positive_interval_is_accepted(value):
+    assert collect_all.positive_int(value) == int(value)
+
+@pytest.mark.parametrize("value", ["0", "-5", "x", "1.5"])
+def test_non_positive_or_non_integer_interval_is_rejected(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        collect_all.positive_int(value)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the PostgreSQL collector's DSN handling
+"""
+
+from psycopg2.extensions import parse_dsn
+
+import scripts.collect_postgres_stats as collector
+
+def test_dsn_for_switches_only_the_database(monkeypatch):
+    monkeypatch.setattr(collector, '_BASE_POSTGRES_DSN', {
+        'user': 'app', 'password': 'secret', 'dbname': 'postgres',
+        'host': 'db.internal', 'port': '6543', 'sslmode': 'require'
+    })
+    assert parse_dsn(collector._postgres_dsn_for('performance_history')) == {
+        'user': 'app', 'password': 'secret', 'dbname': 'performance_history',
+        'host': 'db.internal', 'port': '6543', 'sslmode': 'require'
+    }
+
+def test_dsn_for_quotes_unusual_values(monkeypatch):
+    monkeypatch.setattr(collector, '_BASE_POSTGRES_DSN', {'user': 'app', 'password': "p@ss word'"})
+    dsn = parse_dsn(collector._postgres_dsn_for('my db'))
+    assert dsn == {'user': 'app', 'password': "p@ss word'", 'dbname': 'my db'}
+
+def test_dsn_for_leaves_the_shared_base_untouched(monkeypatch):
+    base = {'user': 'app', 'dbname': 'postgres'}
+    monkeypatch.setattr(collector, '_BASE_POSTGRES_DSN', base)
+    collector._postgres_dsn_for('other')
+    assert base == {'user': 'app', 'dbname': 'postgres'}
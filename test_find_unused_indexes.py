@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for the unused index helpers that need no database
+"""
+
+import pytest
+
+from scripts.find_unused_indexes import _pg_size_pretty
+
+# Expected strings are what PostgreSQL's pg_size_pretty() returns for the same byte counts
+@pytest.mark.parametrize("size, expected", [
+    (0, "0 bytes"),
+    (10239, "10239 bytes"),
+    (10240, "10 kB"),
+    (1536000, "1500 kB"),
+    (10485759, "10 MB"),
+    (10485760, "10 MB"),
+    (1073741824, "1024 MB"),
+    (5 * 1024 ** 4, "5120 GB"),
+    (30 * 1024 ** 4, "30 TB"),
+])
+def test_pg_size_pretty_matches_postgres(size, expected):
+    assert _pg_size_pretty(size) == expected
+
+def test_pg_size_pretty_rounds_half_up():
+    # Just under 10.5 kB rounds down, 10.5 kB itself rounds up, as on the server
+    assert _pg_size_pretty(10751) == "10 kB"
+    assert _pg_size_pretty(10752) == "11 kB"
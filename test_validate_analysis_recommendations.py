@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for reading analysis files in the recommendation validator
+"""
+
+import io
+import json
+
+import pytest
+
+import scripts.validate_analysis_recommendations as validator
+
+ANALYSIS = {
+    'generated_at': '2024-01-01T00:00:00',
+    'postgresql': {
+        'query': 'SELECT * FROM orders WHERE customer_id = 42',
+        'plan': {'Plan': {'Node Type': 'Seq Scan', 'Plans': [{'Node Type': 'Hash'}]}},
+        'recommendations': [
+            {'type': 'MISSING_INDEX', 'confidence': 0.85, 'evidence': {'columns': ['customer_id'], 'rows': 1200},
+             'suggested_action': 'CREATE INDEX idx_orders_customer_id ON orders (customer_id);'},
+            {'type': 'UNUSED_INDEX_CANDIDATE', 'caveats': [], 'impact': None,
+             'suggested_action': 'DROP INDEX idx_old ON orders;'}
+        ],
+        'stats': [{'calls': 10}]
+    },
+    'mysql': {
+        'recommendations': [],
+        'query': None
+    },
+    'summary': {'total': 2}
+}
+
+def _expected():
+    return {
+        engine: {key: ANALYSIS[engine][key] for key in ('recommendations', 'query')}
+        for engine in ('postgresql', 'mysql')
+    }
+
+def test_stream_keeps_only_recommendations_and_queries():
+    pytest.importorskip('ijson')
+    streamed = validator._stream_analysis_results(io.BytesIO(json.dumps(ANALYSIS).encode()))
+    assert streamed == _expected()
+
+def test_stream_matches_a_full_parse():
+    pytest.importorskip('ijson')
+    data = json.dumps(ANALYSIS, indent=2).encode()
+    full = json.loads(data)
+    streamed = validator._stream_analysis_results(io.BytesIO(data))
+    for engine, sections in streamed.items():
+        for key, value in sections.items():
+            assert value == full[engine][key]
+
+def test_stream_reads_floats_as_floats():
+    pytest.importorskip('ijson')
+    streamed = validator._stream_analysis_results(io.BytesIO(json.dumps(ANALYSIS).encode()))
+    confidence = streamed['postgresql']['recommendations'][0]['confidence']
+    assert isinstance(confidence, float) and confidence == 0.85
+
+def test_stream_skips_engines_that_are_absent():
+    pytest.importorskip('ijson')
+    data = json.dumps({'postgresql': {'query': 'SELECT 1'}}).encode()
+    assert validator._stream_analysis_results(io.BytesIO(data)) == {'postgresql': {'query': 'SELECT 1'}}
+
+def test_load_reads_paths_and_binary_files(tmp_path):
+    path = tmp_path / 'analysis.json'
+    path.write_bytes(json.dumps(ANALYSIS).encode())
+    from_path = validator.load_analysis_results(str(path))
+    with open(path, 'rb') as f:
+        from_file = validator.load_analysis_results(f)
+    assert from_path == from_file
+    for engine, sections in _expected().items():
+        for key, value in sections.items():
+            assert from_path[engine][key] == value
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+WSGI Entry Point
+Exposes the Flask dashboard for production servers such as gunicorn.
+"""
+
+from app import app
+
+application = app